@@ -1,20 +1,47 @@
-from flask import Flask
+import gzip
+from flask import Flask, request, current_app
 from config import Config
-from database import db
-from routes import api
-from models import BlockLimit
+from database import db, init_db
+from routes import api, GZIP_ETAG_SUFFIX
+from models import BlockLimit, ScanReceipt
 from scheduler import start_scheduler
+from migrations import run_migrations
+from trip_state import active_trips
+
+def compress_response(response):
+    """
+    Gzips JSON answers of at least GZIP_MIN_BYTES when the client accepts
+    gzip. The gzipped body is a different representation, so its ETag
+    gets GZIP_ETAG_SUFFIX and never matches the plain one.
+    """
+    min_bytes = current_app.config['GZIP_MIN_BYTES']
+    if (not min_bytes or response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < min_bytes or 'gzip' not in request.accept_encodings:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(etag + GZIP_ETAG_SUFFIX, weak)
+    return response
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    db.init_app(app)
+    init_db(app)
 
     app.register_blueprint(api)
+    app.after_request(compress_response)
 
     with app.app_context():
         db.create_all()
+        run_migrations()
 
         if not BlockLimit.query.first():
             defaults = {'A': 15, 'D1': 15, 'D2': 15, 'B': 10, 'C': 10}
@@ -22,11 +49,15 @@ def create_app():
                 db.session.add(BlockLimit(block_name=b, minutes=m))
             db.session.commit()
 
+        print(f"Loaded {active_trips.rebuild()} active trips.")
+        ScanReceipt.prune(app.config['SCAN_RECEIPT_RETENTION_DAYS'])
+        db.session.commit()
+
         # make sure the Arduino controller is initialised early so that
         # connection errors show up on startup rather than on first scan
         from arduino_service import get_gate_controller
         get_gate_controller()
-        start_scheduler()
+        print(f"Watching {start_scheduler(app)} trip deadlines.")
 
     return app
 
@@ -0,0 +1,38 @@
+import secrets
+import threading
+
+class ChangeCounters:
+    """
+    In-memory change counter per dashboard-facing resource, used as the
+    ETag of its read endpoints so an unchanged poll costs a 304 instead of
+    a query and a full payload.
+
+    Writers call bump() once their change is committed (trip changes are
+    bumped by the active-trip table as it applies them). Readers take the
+    ETag before reading the data, so a response is never tagged newer than
+    its body. The per-process epoch keeps tags from an earlier run, or
+    another worker, from ever matching.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+        self.epoch = secrets.token_hex(4)
+
+    def bump(self, *resources):
+        with self._lock:
+            for resource in resources:
+                self._counts[resource] = self._counts.get(resource, 0) + 1
+
+    def version(self, resource):
+        with self._lock:
+            return self._counts.get(resource, 0)
+
+    def etag(self, resource):
+        return f"{resource}-{self.epoch}-{self.version(resource)}"
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counts)
+
+change_counters = ChangeCounters()
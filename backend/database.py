@@ -1,3 +1,46 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
 db = SQLAlchemy()
+
+# SQLALCHEMY_ENGINE_OPTIONS that only a sized connection pool accepts
+POOL_SIZE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+def is_memory_sqlite(uri):
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and (
+        url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory')
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record, pragmas):
+    cursor = dbapi_connection.cursor()
+    for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def init_db(app):
+    """
+    Binds db to the app. For SQLite, every new pooled connection is set up
+    with the SQLITE_PRAGMAS from the config, so request threads and the
+    scheduler thread share one WAL-mode database instead of serialising on
+    its file lock.
+
+    An in-memory SQLite database lives in a single shared connection
+    (StaticPool), so the pool sizing options are left out for it.
+    """
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    if is_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {k: v for k, v in options.items() if k not in POOL_SIZE_OPTIONS}
+    db.init_app(app)
+    with app.app_context():
+        engine = db.engine
+        pragmas = app.config.get('SQLITE_PRAGMAS')
+        if engine.dialect.name == 'sqlite' and pragmas:
+            event.listen(engine, 'connect', lambda conn, record: apply_sqlite_pragmas(conn, record, pragmas))
+
+def uses_row_locks():
+    """
+    True on server databases. SQLite has no row locks (it drops FOR UPDATE)
+    and serialises writers on the whole file instead.
+    """
+    return db.engine.dialect.name != 'sqlite'
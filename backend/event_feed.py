@@ -0,0 +1,48 @@
+import queue
+import threading
+
+class Subscription:
+    def __init__(self, max_pending):
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+class EventFeed:
+    """
+    Fans trip lifecycle events out to stream subscribers (see /events).
+
+    Each subscriber has a bounded queue. One that falls more than
+    max_pending events behind is dropped rather than buffered without
+    limit; its stream ends and the client resyncs from a new snapshot.
+    """
+
+    def __init__(self, max_pending=1000):
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self.last_id = 0
+
+    def publish(self, kind, data):
+        with self._lock:
+            self.last_id += 1
+            event = (self.last_id, kind, data)
+            for sub in list(self._subscribers):
+                try:
+                    sub.queue.put_nowait(event)
+                except queue.Full:
+                    sub.overflowed = True
+                    self._subscribers.discard(sub)
+
+    def subscribe(self):
+        """Returns (subscription, id of the last event published before it)."""
+        sub = Subscription(self.max_pending)
+        with self._lock:
+            self._subscribers.add(sub)
+            return sub, self.last_id
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
@@ -0,0 +1,54 @@
+import threading
+from models import BlockLimit
+
+class BlockLimitCache:
+    """
+    Process-wide cache of block time limits (block name -> minutes).
+
+    Limits change rarely (via /admin/update_limit), so scans read them from
+    memory. Writers call invalidate() after committing; the next reader
+    reloads the whole table once. A load that raced with an invalidation is
+    discarded instead of being cached.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limits = None
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def all(self):
+        """Returns the {block: minutes} mapping; treat it as read-only."""
+        with self._lock:
+            if self._limits is not None:
+                self.hits += 1
+                return self._limits
+            self.misses += 1
+            version = self._version
+
+        limits = {b.block_name: b.minutes for b in BlockLimit.query.order_by(BlockLimit.id).all()}
+
+        with self._lock:
+            if self._version == version:
+                self._limits = limits
+        return limits
+
+    def get(self, block, default=None):
+        return self.all().get(block, default)
+
+    def invalidate(self):
+        with self._lock:
+            self._limits = None
+            self._version += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'version': self._version,
+                'loaded': self._limits is not None
+            }
+
+limits_cache = BlockLimitCache()
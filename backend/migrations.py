@@ -0,0 +1,79 @@
+from datetime import datetime
+from sqlalchemy import text
+from database import db
+from models import pack_encoding
+import json
+
+# db.create_all() only creates missing tables; changes to existing tables or
+# rows are listed here and applied once, in order, on startup.
+
+def encodings_to_blobs():
+    """Convert JSON text face encodings to packed float32 blobs"""
+    rows = db.session.execute(text("SELECT id, face_encoding FROM student")).all()
+    for student_id, value in rows:
+        if isinstance(value, str):
+            db.session.execute(
+                text("UPDATE student SET face_encoding = :blob WHERE id = :id"),
+                {'blob': pack_encoding(json.loads(value)), 'id': student_id}
+            )
+
+def seed_student_changes():
+    """Log students registered before the change log existed, so syncing from revision 0 sees them"""
+    db.session.execute(text(
+        "INSERT INTO student_change (student_id, op, changed_at) "
+        "SELECT id, 'upsert', created_at FROM student "
+        "WHERE id NOT IN (SELECT student_id FROM student_change) ORDER BY id"
+    ))
+
+def trip_log_indexes():
+    """Index trips by (start_time, id) and (status, start_time, id), and students by block, for trip log paging"""
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_trip_start_time_id ON trip (start_time, id)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_trip_status_start_time_id ON trip (status, start_time, id)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_student_block ON student (block)"))
+
+def trip_composite_indexes():
+    """Replace the single-column trip status/is_alert indexes with composite ones and drop the student block index"""
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_trip_student_id_status ON trip (student_id, status)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_trip_status_expected_end_time ON trip (status, expected_end_time)"))
+    db.session.execute(text("CREATE INDEX IF NOT EXISTS ix_trip_is_alert_expected_end_time ON trip (is_alert, expected_end_time)"))
+    # both are prefixes of the composite indexes above
+    db.session.execute(text("DROP INDEX IF EXISTS ix_trip_status"))
+    db.session.execute(text("DROP INDEX IF EXISTS ix_trip_is_alert"))
+    # with it the planner filters students by block first and then sorts
+    # all of their trips; without it the block filter walks ix_trip_start_time_id
+    db.session.execute(text("DROP INDEX IF EXISTS ix_student_block"))
+
+def unique_active_trip():
+    """Cancel all but the newest active trip per student and enforce one active trip per student"""
+    db.session.execute(text(
+        "UPDATE trip SET status = 'cancelled' WHERE status = 'active' AND id NOT IN "
+        "(SELECT MAX(id) FROM trip WHERE status = 'active' GROUP BY student_id)"
+    ))
+    db.session.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_trip_active_student ON trip (student_id) WHERE status = 'active'"
+    ))
+
+MIGRATIONS = [
+    (1, encodings_to_blobs),
+    (2, seed_student_changes),
+    (3, trip_log_indexes),
+    (4, trip_composite_indexes),
+    (5, unique_active_trip),
+]
+
+def run_migrations():
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, applied_at TIMESTAMP)"
+    ))
+    applied = {row[0] for row in db.session.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, migration in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"Applying migration {version}: {migration.__doc__}")
+        migration()
+        db.session.execute(
+            text("INSERT INTO schema_migrations (version, applied_at) VALUES (:v, :t)"),
+            {'v': version, 't': datetime.now()}
+        )
+        db.session.commit()
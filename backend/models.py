@@ -1,12 +1,26 @@
-from datetime import datetime
-from database import db
-import json
+from datetime import datetime, timedelta
+from database import db, uses_row_locks
+from sqlalchemy import text
+from sqlalchemy.orm import defer
+import struct
+
+ENCODING_DIM = 128
+# pg_advisory_xact_lock key serialising change log inserts (see StudentChange.log)
+CHANGE_LOG_LOCK = 0x5C4A06
+
+def pack_encoding(encoding):
+    """Packs a list of floats into a little-endian float32 blob."""
+    return struct.pack(f'<{len(encoding)}f', *encoding)
+
+def unpack_encoding(blob):
+    """Inverse of pack_encoding; returns a list of floats."""
+    return list(struct.unpack(f'<{len(blob) // 4}f', blob))
 
 class Student(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
-    # Storing face encoding as a JSON string (list of floats)
-    face_encoding = db.Column(db.Text, nullable=False)
+    # Storing face encoding as packed little-endian float32 (see pack_encoding)
+    face_encoding = db.Column(db.LargeBinary, nullable=False)
     block = db.Column(db.String(10), nullable=False) # A, B, C, D1, D2
     regno = db.Column(db.String(50),nullable=False,unique=True)
     created_at = db.Column(db.DateTime, default=datetime.now)
@@ -20,6 +34,51 @@ class Student(db.Model):
             'created_at': self.created_at.isoformat()
         }
 
+    @staticmethod
+    def roster():
+        """Student query that leaves face_encoding unloaded; for listings that only need to_dict."""
+        return Student.query.options(defer(Student.face_encoding))
+
+class StudentChange(db.Model):
+    # Append-only log of registrations and deletions. Its id doubles as the
+    # gallery revision that gate clients sync from.
+    id = db.Column(db.Integer, primary_key=True)
+    student_id = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False) # upsert, delete
+    changed_at = db.Column(db.DateTime, default=datetime.now)
+
+    @staticmethod
+    def log(student_id, op):
+        """
+        Adds a change to the session. Revisions must become visible in id
+        order, or a gate that syncs between two commits skips the lower id
+        for good. SQLite serialises writers already; on a server database
+        (PostgreSQL, see config.database_url) a transaction-scoped advisory
+        lock, taken before the id is drawn and held until commit, does it.
+        """
+        if uses_row_locks():
+            db.session.execute(text("SELECT pg_advisory_xact_lock(:key)"), {'key': CHANGE_LOG_LOCK})
+        db.session.add(StudentChange(student_id=student_id, op=op))
+
+    @staticmethod
+    def latest_revision():
+        return db.session.query(db.func.max(StudentChange.id)).scalar() or 0
+
+class ScanReceipt(db.Model):
+    # Outcome of every scan that carried a gate-generated scan_id, so a
+    # retried or replayed scan gets the original answer instead of being
+    # applied twice.
+    scan_id = db.Column(db.String(64), primary_key=True)
+    code = db.Column(db.Integer, nullable=False)
+    body = db.Column(db.Text, nullable=False) # JSON response body
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+    @staticmethod
+    def prune(days):
+        """Drops receipts older than `days`; gates stop retrying long before that."""
+        cutoff = datetime.now() - timedelta(days=days)
+        return ScanReceipt.query.filter(ScanReceipt.created_at < cutoff).delete()
+
 class BlockLimit(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     block_name = db.Column(db.String(10), unique=True, nullable=False) 
@@ -34,7 +93,7 @@ class Trip(db.Model):
     start_time = db.Column(db.DateTime, default=datetime.now)
     expected_end_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(20), default='active', index=True)  # active, completed, late
+    status = db.Column(db.String(20), default='active')  # active, completed, late, cancelled (duplicate active trip)
     
     # New fields for bi-directional tracking
     direction = db.Column(db.String(50), nullable=False) # "Hostel -> Library" or "Library -> Hostel"
@@ -42,10 +101,25 @@ class Trip(db.Model):
     end_location = db.Column(db.String(50), nullable=False) # "Library" or "Hostel"
     exceeded_limit = db.Column(db.Boolean, default=False)
     
-    is_alert = db.Column(db.Boolean, default=False, index=True)
+    is_alert = db.Column(db.Boolean, default=False)
 
     student = db.relationship('Student', backref=db.backref('trips', lazy=True))
 
+    # keyset pagination of the trip log walks (start_time, id) newest first,
+    # optionally within one status; the rest serve the active-trip lookup
+    # per student, deadline checks and the alerts list.
+    # tools/query_audit.py checks the hot queries against these.
+    __table_args__ = (
+        db.Index('ix_trip_start_time_id', 'start_time', 'id'),
+        db.Index('ix_trip_status_start_time_id', 'status', 'start_time', 'id'),
+        db.Index('ix_trip_student_id_status', 'student_id', 'status'),
+        db.Index('ix_trip_status_expected_end_time', 'status', 'expected_end_time'),
+        db.Index('ix_trip_is_alert_expected_end_time', 'is_alert', 'expected_end_time'),
+        # at most one active trip per student, enforced by the database
+        db.Index('uq_trip_active_student', 'student_id', unique=True,
+                 sqlite_where=db.text("status = 'active'"), postgresql_where=db.text("status = 'active'")),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -63,3 +137,36 @@ class Trip(db.Model):
             'exceeded_limit': self.exceeded_limit,
             'is_alert': self.is_alert
         }
+
+    @staticmethod
+    def with_student():
+        """
+        Query for the columns to_dict needs, joined with the student in one
+        statement instead of a lazy load per trip. Rows go through row_to_dict.
+        """
+        return db.session.query(
+            Trip.id, Trip.student_id,
+            Student.name.label('student_name'), Student.regno, Student.block,
+            Trip.start_time, Trip.expected_end_time, Trip.end_time, Trip.status,
+            Trip.direction, Trip.start_location, Trip.end_location,
+            Trip.exceeded_limit, Trip.is_alert
+        ).join(Student, Trip.student_id == Student.id)
+
+    @staticmethod
+    def row_to_dict(row):
+        return {
+            'id': row.id,
+            'student_id': row.student_id,
+            'student_name': row.student_name,
+            'reg_no': row.regno,
+            'student_block': row.block,
+            'start_time': row.start_time.isoformat(),
+            'expected_end_time': row.expected_end_time.isoformat(),
+            'end_time': row.end_time.isoformat() if row.end_time else None,
+            'status': row.status,
+            'direction': row.direction,
+            'start_location': row.start_location,
+            'end_location': row.end_location,
+            'exceeded_limit': row.exceeded_limit,
+            'is_alert': row.is_alert
+        }
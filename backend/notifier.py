@@ -0,0 +1,134 @@
+import queue
+import threading
+import time
+from collections import defaultdict
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+class AlertNotifier(threading.Thread):
+    """
+    Sends late-trip alerts to ntfy from a background thread.
+
+    Alerts go into a bounded queue (overflow is counted and dropped rather
+    than blocking the expiry engine). Whatever arrives within `window`
+    seconds of the first alert is sent together, one message per block,
+    so a curfew wave of late students is a handful of digests instead of
+    hundreds of requests. Requests reuse one keep-alive session and are
+    retried with exponential backoff on connection errors, 429 and 5xx.
+    """
+
+    def __init__(self, url, window=5.0, max_pending=1000, retries=4, backoff=1.0, timeout=5.0):
+        super().__init__(daemon=True)
+        self.url = url
+        self.window = window
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+        self._stats = {'alerts': 0, 'dropped': 0, 'messages': 0, 'requests': 0, 'failed': 0}
+        self._stopped = threading.Event()
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, queued=self.pending.qsize())
+
+    def submit(self, student_name, block, direction):
+        try:
+            self.pending.put_nowait((student_name, block, direction))
+            self._count('alerts')
+        except queue.Full:
+            self._count('dropped')
+            print(f"Notification queue full, dropping alert for {student_name}")
+
+    def _collect(self):
+        """Waits for an alert, then gathers what else arrives within the window. None means stop."""
+        first = self.pending.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                alert = self.pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if alert is None:
+                self._stopped.set()
+                break
+            batch.append(alert)
+        return batch
+
+    def run(self):
+        while not self._stopped.is_set():
+            batch = self._collect()
+            if batch is None:
+                return
+            by_block = defaultdict(list)
+            for alert in batch:
+                by_block[alert[1]].append(alert)
+            for block, alerts in by_block.items():
+                self._send(*format_alerts(block, alerts))
+
+    def _send(self, title, body):
+        self._count('messages')
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+            self._count('requests')
+            try:
+                res = self.session.post(
+                    self.url,
+                    data=body.encode('utf-8'),
+                    headers={"Title": title, "Priority": "high", "Tags": "warning,clock1"},
+                    timeout=self.timeout
+                )
+            except requests.RequestException as e:
+                print(f"Failed to send ntfy alert: {e}")
+                continue
+            if res.status_code < 300:
+                return True
+            print(f"ntfy answered {res.status_code} for alert '{title}'")
+            if res.status_code < 500 and res.status_code != 429:
+                break
+        self._count('failed')
+        return False
+
+    def stop(self, timeout=10):
+        """Sends what is already queued, then stops."""
+        try:
+            self.pending.put(None, timeout=1)
+        except queue.Full:
+            self._stopped.set()
+        self.join(timeout)
+
+def format_alerts(block, alerts):
+    """(title, body) for the alerts of one block; a single alert keeps the classic wording."""
+    if len(alerts) == 1:
+        name, _, direction = alerts[0]
+        return "Trip Limit Exceeded!", f"Student {name} is LATE for trip: {direction}"
+    lines = [f"{name}: {direction}" for name, _, direction in alerts]
+    return f"{len(alerts)} students LATE (Block {block})", "\n".join(lines)
+
+notifier = AlertNotifier(
+    f"{Config.NTFY_SRVR}/{Config.NTFY_TOPIC}",
+    window=Config.NTFY_DIGEST_SECONDS,
+    max_pending=Config.NTFY_QUEUE_SIZE,
+    timeout=Config.NTFY_TIMEOUT
+)
+
+def start_notifier():
+    if not notifier.is_alive():
+        notifier.start()
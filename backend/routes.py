@@ -1,13 +1,59 @@
-from flask import Blueprint, request, jsonify, current_app, render_template
-from models import Student, Trip, db, BlockLimit
+from flask import Blueprint, request, jsonify, render_template, Response
+from database import uses_row_locks
+from models import Student, Trip, db, BlockLimit, StudentChange, ScanReceipt, pack_encoding, unpack_encoding, ENCODING_DIM
 from scheduler import schedule_trip_check, cancel_trip_check
 from datetime import datetime, timedelta
+from sqlalchemy.exc import IntegrityError
 import json
+import queue
+import struct
 from arduino_service import open_hostel_gate, open_library_gate
+from limits_cache import limits_cache
+from trip_state import active_trips
+from notifier import notifier
+from change_counters import change_counters
 
 api = Blueprint('api', __name__)
 
 DEFAULT_LIMIT = 10
+# scans older than this (replayed from a gate's offline journal) are
+# recorded with their capture time but no longer open the gate
+LIVE_SCAN_WINDOW = timedelta(seconds=30)
+ALERTS_DEFAULT_LIMIT = 200
+TRIP_LOG_PAGE_SIZE = 50
+TRIP_LOG_MAX_PAGE_SIZE = 200
+STUDENTS_PAGE_SIZE = 50
+STUDENTS_MAX_PAGE_SIZE = 200
+# times a scan is re-applied after losing a race for the same student
+CONFLICT_ATTEMPTS = 3
+ALERTS_MAX_LIMIT = 1000
+# seconds between comment lines on an idle /events stream, so dead clients are noticed
+EVENT_KEEPALIVE = 15
+# appended to the ETag of a gzipped body, which is a different representation
+GZIP_ETAG_SUFFIX = '-gzip'
+
+def conditional(resource, build):
+    """
+    Answers 304 if the client's If-None-Match is the resource's current
+    ETag, otherwise the response from build(). The tag is taken before
+    building, so a change landing meanwhile only costs an extra 200.
+    A gzipped body is tagged with GZIP_ETAG_SUFFIX appended (see
+    app.compress_response), and that tag is honoured as well.
+    The counters only see this process's writes, so with a server
+    database (possibly shared by several processes) every answer is full.
+    """
+    if uses_row_locks():
+        return build()
+    etag = change_counters.etag(resource)
+    matched = next((tag for tag in (etag, etag + GZIP_ETAG_SUFFIX) if tag in request.if_none_match), None)
+    if matched:
+        response = Response(status=304)
+        etag = matched
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @api.route('/')
 def home():
@@ -31,6 +77,9 @@ def register_student():
     if not name or not face_encoding or not block or not regno:
         return jsonify({'error': 'Missing Fields'}), 400
 
+    if len(face_encoding) != ENCODING_DIM:
+        return jsonify({'error': f'Face encoding must have {ENCODING_DIM} values'}), 400
+
     # Check if student already exists 
     existing = Student.query.filter_by(regno=regno).first()
     if existing:
@@ -38,12 +87,15 @@ def register_student():
 
     new_student = Student(
         name=name,
-        face_encoding=json.dumps(face_encoding),
+        face_encoding=pack_encoding(face_encoding),
         block=block,
         regno=regno
     )
     db.session.add(new_student)
+    db.session.flush()
+    StudentChange.log(new_student.id, 'upsert')
     db.session.commit()
+    change_counters.bump('students')
 
     return jsonify({'message': 'Student registered successfully', 'student_id': new_student.id}), 201
 
@@ -52,27 +104,131 @@ def delete_student(regno):
     student = Student.query.filter_by(regno=regno).first()
     if student:
         db.session.delete(student)
+        StudentChange.log(student.id, 'delete')
+        active_trips.stage_remove_student(student.id)
         db.session.commit()
+        change_counters.bump('students')
         return {"message": "Deleted"}, 200
     return {"message": "Not found"}, 404
 
+def student_roster_query(args):
+    """Roster query for the /students filters, without cursor or limit."""
+    query = Student.roster()
+    if args.get('block'):
+        query = query.filter(db.func.upper(Student.block) == args['block'].upper())
+    if args.get('q'):
+        pattern = f"%{args['q']}%"
+        query = query.filter(db.or_(Student.name.ilike(pattern), Student.regno.ilike(pattern)))
+    return query
+
+@api.route('/students', methods=['GET'])
+def students():
+    """
+    Registered students (no face encodings), in registration order, one
+    page at a time: pass the previous response's next_cursor as ?cursor=
+    to continue. Optional filters: q (name or reg no substring), block
+    and limit. total counts every student matching the filters.
+    """
+    limit = max(1, min(request.args.get('limit', STUDENTS_PAGE_SIZE, type=int), STUDENTS_MAX_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    try:
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    query = student_roster_query(request.args)
+
+    def build():
+        paged = query.filter(Student.id > cursor) if cursor is not None else query
+        rows = paged.order_by(Student.id).limit(limit + 1).all()
+        page = rows[:limit]
+        return jsonify({
+            'items': [student.to_dict() for student in page],
+            'total': query.order_by(None).count(),
+            'next_cursor': str(page[-1].id) if len(rows) > limit else None
+        })
+    return conditional('students', build)
+
+def encoding_entry(student):
+    return {
+        'name': student.name,
+        'block': student.block,
+        'reg_no':student.regno,
+        'encoding': unpack_encoding(student.face_encoding)
+    }
+
 @api.route('/get_encodings', methods=['GET'])
 def get_encodings():
-    students = Student.query.all()
-    encodings = {}
-    for student in students:
-        encodings[student.id] = {
-            'name': student.name,
-            'block': student.block,
-            'reg_no':student.regno,
-            'encoding': json.loads(student.face_encoding)
-        }
-    return jsonify(encodings), 200
+    def build():
+        revision = StudentChange.latest_revision()
+        students = Student.query.all()
+        encodings = {}
+        for student in students:
+            encodings[student.id] = encoding_entry(student)
+        response = jsonify(encodings)
+        response.headers['X-Gallery-Revision'] = str(revision)
+        return response
+    return conditional('students', build)
+
+@api.route('/get_encodings/binary', methods=['GET'])
+def get_encodings_binary():
+    """
+    Bulk export for gate clients:
+      b'GAL1' | uint32 header length | JSON header | padding | float32 matrix
+    The header carries count, dim, revision and the per-row ids/names; the
+    matrix is the stored blobs concatenated as-is (row-major, little-endian),
+    starting at a 16-byte aligned offset so clients can map it zero-copy.
+    """
+    revision = StudentChange.latest_revision()
+    rows = db.session.query(Student.id, Student.name, Student.face_encoding).all()
+
+    header = json.dumps({
+        'count': len(rows),
+        'dim': ENCODING_DIM,
+        'revision': revision,
+        'ids': [r.id for r in rows],
+        'names': [r.name for r in rows],
+    }).encode('utf-8')
+    prefix = b'GAL1' + struct.pack('<I', len(header)) + header
+    prefix += b' ' * (-len(prefix) % 16)
+
+    body = prefix + b''.join(r.face_encoding for r in rows)
+    response = Response(body, mimetype='application/octet-stream')
+    response.headers['X-Gallery-Revision'] = str(revision)
+    return response, 200
+
+@api.route('/get_encodings/changes', methods=['GET'])
+def get_encoding_changes():
+    """
+    Registrations and deletions after revision `since`, collapsed to the
+    latest operation per student. `reset` tells the client its revision is
+    unknown here (e.g. the database was replaced) and it must reload fully.
+    """
+    since = request.args.get('since', 0, type=int)
+    latest_revision = StudentChange.latest_revision()
+    if since > latest_revision:
+        return jsonify({'revision': latest_revision, 'reset': True, 'upserts': {}, 'deleted': []}), 200
+
+    changes = StudentChange.query.filter(StudentChange.id > since).order_by(StudentChange.id).all()
+    last_op = {}
+    for change in changes:
+        last_op[change.student_id] = change.op
+
+    upsert_ids = [sid for sid, op in last_op.items() if op == 'upsert']
+    students = Student.query.filter(Student.id.in_(upsert_ids)).all() if upsert_ids else []
+
+    return jsonify({
+        'revision': changes[-1].id if changes else since,
+        'reset': False,
+        'upserts': {student.id: encoding_entry(student) for student in students},
+        'deleted': [sid for sid, op in last_op.items() if op == 'delete']
+    }), 200
 
 @api.route('/admin/get_limits', methods=['GET'])
 def get_limits():
-    limits = BlockLimit.query.all()
-    return jsonify([l.to_dict() for l in limits]), 200
+    def build():
+        limits = limits_cache.all()
+        return jsonify([{'block': block, 'minutes': minutes} for block, minutes in limits.items()])
+    return conditional('limits', build)
 
 @api.route('/admin/update_limit', methods=['POST'])
 def update_limit():
@@ -92,55 +248,70 @@ def update_limit():
         db.session.add(limit_entry)
     
     db.session.commit()
+    limits_cache.invalidate()
+    change_counters.bump('limits')
     return jsonify({'message': f'Limit for Block {block} updated to {minutes} minutes'}), 200
 
-def process_scan(student_id, current_location):
+def parse_scan_time(value):
+    """
+    Capture time sent by a gate (naive local ISO-8601), or now if absent.
+    Times in the future (clock skew) are clamped to now.
+    Raises ValueError for malformed values.
+    """
+    now = datetime.now()
+    if not value:
+        return now
+    return min(datetime.fromisoformat(value), now)
+
+def apply_scan(student, active_trip, current_location, scanned_at, limits):
+    """
+    Applies one scan to the session without committing; the matching change
+    to the active-trip table is staged and lands with the commit.
+    limits maps block name -> minutes. Returns (body, status, trip, action)
+    where action is 'started', 'completed' or None and trip is the trip it
+    touched.
+    """
     target_location = "Library" if current_location == "Hostel" else "Hostel"
     direction_label = f"{current_location} -> {target_location}"
-    
-    student = Student.query.get(student_id)
-    if not student:
-        return jsonify({'error': 'Student not found'}), 404
-
-    # Atomic check for active trips
-    active_trip = Trip.query.filter_by(student_id=student_id, status='active').first()
+    is_live = datetime.now() - scanned_at <= LIVE_SCAN_WINDOW
 
     if active_trip:
+        if scanned_at < active_trip.start_time:
+            # A replayed scan at the far end of the current trip's route,
+            # taken before it began: the student actually travelled the
+            # other way and the current trip is that journey's arrival
+            if active_trip.end_location == current_location:
+                return replace_phantom_trip(student, active_trip, current_location, scanned_at, limits)
+            # otherwise it cannot belong to the current trip
+            return {'message': 'Stale scan ignored', 'open_gate': False}, 200, active_trip, None
+
         # Check if they are arriving at the destination of their current trip
         if active_trip.end_location == current_location:
-            active_trip.end_time = datetime.now()
+            active_trip.end_time = scanned_at
             
             # lateness
             is_late = active_trip.end_time > active_trip.expected_end_time
             active_trip.status = 'late' if is_late else 'completed'
             active_trip.is_alert = is_late
             active_trip.exceeded_limit = is_late
-            
-            db.session.commit()
-            cancel_trip_check(active_trip.id)
-            
-            if current_location == "Hostel":
-                open_hostel_gate()
-            else:
-                open_library_gate()
-            
-            return jsonify({
+            active_trips.stage_finish(active_trip, active_trip.status, active_trip.end_time)
+
+            return {
                 'message': f'Journey to {current_location} completed.',
                 'status': active_trip.status,
-                'open_gate': True
-            }), 200
+                'open_gate': is_live
+            }, 200, active_trip, 'completed'
         
         # If they scan again at the same starting location, ignore
-        return jsonify({'message': 'Trip already in progress', 'open_gate': False}), 200
+        return {'message': 'Trip already in progress', 'open_gate': False}, 200, active_trip, None
 
     # Start new trip
-    block_config = BlockLimit.query.filter_by(block_name=student.block.upper()).first()
-    duration = block_config.minutes if block_config else DEFAULT_LIMIT
-    start_time = datetime.now()
+    duration = limits.get(student.block.upper(), DEFAULT_LIMIT)
+    start_time = scanned_at
     expected_end_time = start_time + timedelta(minutes=duration)
 
     new_trip = Trip(
-        student_id=student_id,
+        student_id=student.id,
         start_time=start_time,
         expected_end_time=expected_end_time,
         status='active',
@@ -150,44 +321,399 @@ def process_scan(student_id, current_location):
     )
     
     db.session.add(new_trip)
-    db.session.commit()
+    db.session.flush()
+    active_trips.stage_start(new_trip, student)
 
-    # Schedule the background alert
-    schedule_trip_check(current_app._get_current_object(), new_trip.id, expected_end_time)
-    
-    if current_location == "Hostel":
+    return {
+        'message': f'Started timer: {direction_label}',
+        'trip_id': new_trip.id,
+        'open_gate': is_live
+    }, 201, new_trip, 'started'
+
+def replace_phantom_trip(student, phantom, start_location, scanned_at, limits):
+    """
+    Records the trip from `start_location` at scanned_at that ended when
+    `phantom` was started, and cancels `phantom`, which a late-arriving
+    scan from the other gate shows was that arrival misread as a departure.
+    Returns the apply_scan tuple with action 'completed' for `phantom`, so
+    callers drop its deadline.
+    """
+    duration = limits.get(student.block.upper(), DEFAULT_LIMIT)
+    expected_end_time = scanned_at + timedelta(minutes=duration)
+    is_late = phantom.start_time > expected_end_time
+    trip = Trip(
+        student_id=student.id,
+        start_time=scanned_at,
+        expected_end_time=expected_end_time,
+        end_time=phantom.start_time,
+        status='late' if is_late else 'completed',
+        direction=f"{start_location} -> {phantom.start_location}",
+        start_location=start_location,
+        end_location=phantom.start_location,
+        exceeded_limit=is_late,
+        is_alert=is_late
+    )
+    phantom.status = 'cancelled'
+    db.session.add(trip)
+    db.session.flush()
+    active_trips.stage_replace(phantom, trip, student)
+
+    return {
+        'message': f'Journey to {phantom.start_location} completed.',
+        'status': trip.status,
+        'trip_id': trip.id,
+        'open_gate': False
+    }, 200, phantom, 'completed'
+
+def open_gate_at(location):
+    if location == "Hostel":
         open_hostel_gate()
     else:
         open_library_gate()
 
+def lock_students(student_ids):
+    """
+    Loads students by id with SELECT ... FOR UPDATE, in id order so two
+    batches never wait on each other. Scans for the same student then run
+    one at a time on server databases.
+    """
+    return Student.query.filter(Student.id.in_(student_ids)).order_by(Student.id).with_for_update().all()
+
+def load_active_trips(student_ids, from_db=False):
+    """
+    student id -> active Trip, for students already locked by lock_students.
+    With row locks (several backend processes may share the database), or
+    from_db, this reads the rows from the database; otherwise the in-memory
+    table is authoritative and only the trips it names are loaded, by
+    primary key.
+    """
+    if from_db or uses_row_locks():
+        query = Trip.query.filter(Trip.student_id.in_(student_ids), Trip.status == 'active').with_for_update()
+        return {t.student_id: t for t in query}
+
+    trip_ids = [entry['id'] for entry in map(active_trips.get, student_ids) if entry]
+    if not trip_ids:
+        return {}
+    return {t.student_id: t for t in Trip.query.filter(Trip.id.in_(trip_ids))}
+
+def valid_scan_id(scan_id):
+    return scan_id is None or (isinstance(scan_id, str) and 0 < len(scan_id) <= 64)
+
+def scan_receipts(scan_ids):
+    """scan_id -> (body, code) for the given scans that were already applied."""
+    scan_ids = [sid for sid in scan_ids if sid]
+    if not scan_ids:
+        return {}
+    receipts = ScanReceipt.query.filter(ScanReceipt.scan_id.in_(scan_ids))
+    return {r.scan_id: (json.loads(r.body), r.code) for r in receipts}
+
+def record_receipt(scan_id, body, code):
+    if scan_id:
+        db.session.add(ScanReceipt(scan_id=scan_id, code=code, body=json.dumps(body)))
+
+def process_scan(student_id, current_location, scanned_at=None, scan_id=None):
+    """
+    Applies one scan and commits. A scan_id that was seen before gets the
+    stored response back without being applied again. If a concurrent
+    request commits a trip for the same student first (the unique
+    active-trip index rejects ours), the scan is re-applied on top of that
+    trip, up to CONFLICT_ATTEMPTS times in all.
+    """
+    scanned_at = scanned_at or datetime.now()
+
+    for attempt in range(CONFLICT_ATTEMPTS):
+        receipt = scan_receipts([scan_id]).get(scan_id)
+        if receipt:
+            body, status = receipt
+            return jsonify(body), status
+
+        try:
+            students = lock_students([int(student_id)])
+        except (TypeError, ValueError):
+            students = []
+        if not students:
+            return jsonify({'error': 'Student not found'}), 404
+        student = students[0]
+
+        try:
+            # on the retry the in-memory table may not have caught up with
+            # the other request's commit yet, so ask the database
+            active_trip = load_active_trips([student.id], from_db=attempt > 0).get(student.id)
+            body, status, trip, action = apply_scan(student, active_trip, current_location, scanned_at, limits_cache.all())
+            record_receipt(scan_id, body, status)
+            # read before the commit expires them
+            trip_id, deadline = (trip.id, trip.expected_end_time) if trip else (None, None)
+            db.session.commit()  # also releases the student's row lock
+            break
+        except IntegrityError:
+            db.session.rollback()
+    else:
+        return jsonify({'error': 'Conflicting scans for this student, retry'}), 409
+
+    if action is None:
+        return jsonify(body), status
+
+    if action == 'completed':
+        cancel_trip_check(trip_id)
+    else:
+        # Schedule the background alert
+        schedule_trip_check(trip_id, deadline)
+
+    if body['open_gate']:
+        open_gate_at(current_location)
+
+    return jsonify(body), status
+
+def apply_batch(valid, results, from_db=False):
+    """
+    Applies the parsed events of one /scan_batch request to the session,
+    filling in results. Returns {trip id: deadline} for trips started and
+    still active, the ids of trips completed and the locations whose gates
+    should open.
+    """
+    receipts = scan_receipts([scan_id for _, _, _, _, scan_id in valid])
+    student_ids = {student_id for _, _, student_id, _, _ in valid}
+    students, active = {}, {}
+    if student_ids:
+        students = {s.id: s for s in lock_students(student_ids)}
+        active = load_active_trips(list(students), from_db)
+    limits = limits_cache.all()
+
+    started, completed, gates = {}, [], set()
+    for scanned_at, i, student_id, location, scan_id in sorted(valid, key=lambda e: (e[0], e[1])):
+        if scan_id in receipts:
+            body, status = receipts[scan_id]
+            results[i] = dict(body, code=status)
+            continue
+
+        student = students.get(student_id)
+        if not student:
+            results[i] = {'code': 404, 'error': 'Student not found'}
+            continue
+
+        body, status, trip, action = apply_scan(student, active.get(student_id), location, scanned_at, limits)
+        if action == 'started':
+            active[student_id] = trip
+            started[trip.id] = trip.expected_end_time
+        elif action == 'completed':
+            del active[student_id]
+            if started.pop(trip.id, None) is None:
+                completed.append(trip.id)
+        if body['open_gate']:
+            gates.add(location)
+        if scan_id:
+            record_receipt(scan_id, body, status)
+            receipts[scan_id] = (body, status)
+        results[i] = dict(body, code=status)
+
+    return started, completed, gates
+
+@api.route('/scan_batch', methods=['POST'])
+def scan_batch():
+    """
+    Processes many scans in one transaction, e.g. a curfew burst or a gate
+    replaying its offline journal. Body: {"events": [{"student_id",
+    "location": "Library"|"Hostel", "scanned_at"?, "scan_id"?}, ...]}.
+    Events are applied in capture-time order; results come back in request
+    order, each with the HTTP status the single-scan endpoint would have
+    used as `code`. Events whose scan_id was already applied get the stored
+    result.
+    """
+    events = (request.json or {}).get('events') or []
+    results = [None] * len(events)
+    valid = []
+
+    for i, event in enumerate(events):
+        try:
+            location = event['location']
+            if location not in ("Library", "Hostel") or not valid_scan_id(event.get('scan_id')):
+                raise ValueError(location)
+            valid.append((parse_scan_time(event.get('scanned_at')), i, int(event['student_id']), location,
+                          event.get('scan_id')))
+        except (KeyError, TypeError, ValueError):
+            results[i] = {'code': 400, 'error': 'Invalid scan event'}
+
+    for attempt in range(CONFLICT_ATTEMPTS):
+        try:
+            started, completed, gates = apply_batch(valid, results, from_db=attempt > 0)
+            db.session.commit()
+            break
+        except IntegrityError:
+            # a concurrent request started a trip (or stored a receipt) for
+            # one of these students first; redo the batch on top of it
+            db.session.rollback()
+    else:
+        return jsonify({'error': 'Conflicting concurrent scans, retry'}), 409
+
+    for trip_id in completed:
+        cancel_trip_check(trip_id)
+    for trip_id, deadline in started.items():
+        schedule_trip_check(trip_id, deadline)
+    for location in gates:
+        open_gate_at(location)
+
+    return jsonify({'results': results}), 200
+
+@api.route('/admin/cache_stats', methods=['GET'])
+def cache_stats():
     return jsonify({
-        'message': f'Started timer: {direction_label}',
-        'trip_id': new_trip.id,
-        'open_gate': True
-    }), 201
+        'block_limits': limits_cache.stats(),
+        'event_subscribers': len(active_trips.feed),
+        'change_counters': change_counters.stats()
+    }), 200
+
+@api.route('/admin/notifier_stats', methods=['GET'])
+def notifier_stats():
+    return jsonify(notifier.stats()), 200
+
+@api.route('/admin/active_trips/check', methods=['GET'])
+def check_active_trips():
+    """
+    Compares the in-memory active-trip table with the database.
+    With ?repair=1 the table is rebuilt from the database afterwards.
+    """
+    report = active_trips.check_consistency()
+    if request.args.get('repair', type=int):
+        report['rebuilt'] = active_trips.rebuild()
+    return jsonify(report), 200
+
+def encode_cursor(row):
+    return f"{row.start_time.isoformat()}_{row.id}"
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor. Raises ValueError for malformed cursors."""
+    start_time, _, trip_id = cursor.rpartition('_')
+    return datetime.fromisoformat(start_time), int(trip_id)
+
+def trip_log_query(args):
+    """
+    Filtered, cursor-positioned trip log query for the /trip_logs arguments,
+    without the limit. Raises ValueError for malformed dates or cursors.
+    """
+    query = Trip.with_student()
+    status = args.get('status')
+    if status:
+        query = query.filter(Trip.status == status)
+    else:
+        query = query.filter(Trip.status != 'active')
+
+    if args.get('block'):
+        # blocks are stored as typed at registration, e.g. 'a' or 'd1'
+        query = query.filter(db.func.upper(Student.block) == args['block'].upper())
+    if args.get('direction'):
+        query = query.filter(Trip.direction == args['direction'])
+    if args.get('q'):
+        pattern = f"%{args['q']}%"
+        query = query.filter(db.or_(Student.name.ilike(pattern), Student.regno.ilike(pattern)))
+
+    if args.get('since'):
+        query = query.filter(Trip.start_time >= datetime.fromisoformat(args['since']))
+    if args.get('until'):
+        query = query.filter(Trip.start_time < datetime.fromisoformat(args['until']))
+    if args.get('cursor'):
+        query = query.filter(db.tuple_(Trip.start_time, Trip.id) < decode_cursor(args['cursor']))
+    return query.order_by(Trip.start_time.desc(), Trip.id.desc())
 
 @api.route('/trip_logs', methods=['GET'])
 def trip_logs():
-    # Fetch trips that are NOT active, ordered by most recent first
-    logs = Trip.query.filter(Trip.status != 'active').order_by(Trip.start_time.desc()).limit(100).all()
-    return jsonify([t.to_dict() for t in logs]), 200
+    """
+    Finished trips, newest first, one page at a time. Pages are keyed on
+    (start_time, id), so every page costs the same however deep it is:
+    pass the previous response's next_cursor as ?cursor= to continue.
+    Optional filters: q (name or reg no substring), block, direction,
+    status, since and until (ISO datetimes bounding start_time, until
+    exclusive) and limit.
+    """
+    limit = max(1, min(request.args.get('limit', TRIP_LOG_PAGE_SIZE, type=int), TRIP_LOG_MAX_PAGE_SIZE))
+    try:
+        query = trip_log_query(request.args)
+    except ValueError:
+        return jsonify({'error': 'Invalid date or cursor'}), 400
+
+    def build():
+        rows = query.limit(limit + 1).all()
+        page = rows[:limit]
+        return jsonify({
+            'items': [Trip.row_to_dict(row) for row in page],
+            'next_cursor': encode_cursor(page[-1]) if len(rows) > limit else None
+        })
+    return conditional('trip_logs', build)
+
+def handle_scan_request(current_location):
+    data = request.json
+    try:
+        scanned_at = parse_scan_time(data.get('scanned_at'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid scanned_at timestamp'}), 400
+    if not valid_scan_id(data.get('scan_id')):
+        return jsonify({'error': 'Invalid scan_id'}), 400
+    return process_scan(data.get('student_id'), current_location, scanned_at, data.get('scan_id'))
 
 @api.route('/scan_library', methods=['POST'])
 def scan_library():
-    return process_scan(request.json.get('student_id'), "Library")
+    return handle_scan_request("Library")
 
 @api.route('/scan_hostel', methods=['POST'])
 def scan_hostel():
-    return process_scan(request.json.get('student_id'), "Hostel")
+    return handle_scan_request("Hostel")
 
 @api.route('/active_timers', methods=['GET'])
 def active_timers():
-    trips = Trip.query.filter_by(status='active').all()
-    return jsonify([t.to_dict() for t in trips]), 200
+    return conditional('active_trips', lambda: jsonify(active_trip_list()))
+
+def active_trip_list():
+    """
+    Active trips for /active_timers: from the in-memory table, or from the
+    database when it may be shared with other backend processes.
+    """
+    if uses_row_locks():
+        rows = Trip.with_student().filter(Trip.status == 'active').order_by(Trip.start_time)
+        return [Trip.row_to_dict(row) for row in rows]
+    return active_trips.snapshot()
+
+def format_event(event_id, kind, data):
+    return f"id: {event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+@api.route('/events', methods=['GET'])
+def events():
+    """
+    Server-sent event stream of trip changes for the dashboard. Opens with
+    a 'snapshot' of the active trips, then sends 'started', 'completed',
+    'late' and 'removed' events carrying the trip, and a new 'snapshot'
+    whenever the table is rebuilt (e.g. a repair from
+    /admin/active_trips/check). A client that falls too far behind is
+    disconnected and gets a fresh snapshot on reconnecting.
+    Events come from this process's writes only, so the stream is not
+    offered with a server database; clients poll /active_timers instead.
+    """
+    if uses_row_locks():
+        return jsonify({'error': 'Event stream needs a single backend process on SQLite'}), 501
+    subscription, last_id, trips = active_trips.subscribe()
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            yield format_event(last_id, 'snapshot', trips)
+            while not subscription.overflowed:
+                try:
+                    yield format_event(*subscription.queue.get(timeout=EVENT_KEEPALIVE))
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            active_trips.feed.unsubscribe(subscription)
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def alerts_query():
+    return Trip.with_student().filter(Trip.is_alert == True).order_by(Trip.expected_end_time.desc())
 
 @api.route('/alerts', methods=['GET'])
 def alerts():
-    # Return all late trips (active or completed but late)
+    # Return the most recent late trips (active or completed but late)
     # Actually, if it's 'late', it stays 'late'.
-    late_trips = Trip.query.filter_by(is_alert=True).order_by(Trip.expected_end_time.desc()).all()
-    return jsonify([t.to_dict() for t in late_trips]), 200
+    limit = max(1, min(request.args.get('limit', ALERTS_DEFAULT_LIMIT, type=int), ALERTS_MAX_LIMIT))
+    def build():
+        late_trips = alerts_query().limit(limit).all()
+        return jsonify([Trip.row_to_dict(row) for row in late_trips])
+    return conditional('alerts', build)
@@ -1,68 +1,163 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
-from datetime import datetime
+import heapq
+import threading
+from datetime import datetime, timedelta
 from database import db
-from models import Trip
-import requests
+from models import Trip, Student
+from trip_state import active_trips
+from notifier import notifier, start_notifier
 
-from config import Config
-NTFY_URL = f"{Config.NTFY_SRVR}/{Config.NTFY_TOPIC}"
+EXPIRY_BATCH_SIZE = 500
+RETRY_DELAY = timedelta(seconds=5)
+# a trip replayed from a gate's journal after its deadline may already be
+# over, with the arrival still queued at the other gate; wait this long
+# for it before marking the trip late and alerting
+REPLAY_GRACE = timedelta(minutes=5)
 
-scheduler = BackgroundScheduler()
-
-def ntfy_admin(student_name, direction):
+def expire_trips(trip_ids):
     """
-    Sends a push notification via ntfy.sh
+    Marks the given trips late, in one UPDATE, if they are still active
+    (a scan may have completed them meanwhile). Returns (id, student_id,
+    direction) for the trips that were actually expired.
     """
-    try:
-        res = requests.post(
-            NTFY_URL,
-            data=f"Student {student_name} is LATE for trip: {direction}".encode('utf-8'),
-            headers={
-                "Title": "Trip Limit Exceeded!",
-                "Priority": "high",
-                "Tags": "warning,clock1"
-            }
-        )
-        return res.status_code == 200
-    except Exception as e:
-        print(f"Failed to send ntfy alert: {e}")
-        return False
-
-def check_trip_expiry(app, trip_id):
+    expired = db.session.execute(
+        db.update(Trip)
+        .where(Trip.id.in_(trip_ids), Trip.status == 'active')
+        .values(status='late', is_alert=True)
+        .returning(Trip.id, Trip.student_id, Trip.direction)
+    ).all()
+    for row in expired:
+        active_trips.stage_finish(row, 'late')
+    db.session.commit()
+    return expired
+
+class ExpiryEngine(threading.Thread):
     """
-    Callback function to check if a trip has expired (student is late).
+    Owns every outstanding trip deadline in one min-heap and expires trips
+    from a single thread as their deadlines pass, in batched UPDATEs.
+
+    Scheduling and cancelling are O(log n) and O(1): a cancelled or
+    rescheduled trip only loses its entry in `_deadlines`, and its stale
+    heap entry is skipped when it reaches the top. The heap is rebuilt from
+    the active trips in the database at startup, so deadlines that passed
+    while the backend was down are expired straight away.
     """
-    with app.app_context():
-        trip = Trip.query.get(trip_id)
-        if trip and trip.status == 'active':
-            trip.status = 'late'
-            trip.is_alert = True
-            db.session.commit()
-            print(f"ALERT: Trip {trip_id} for Student {trip.student.name} is LATE!")
 
-            ntfy_admin(trip.student.name, trip.direction)
+    def __init__(self, batch_size=EXPIRY_BATCH_SIZE):
+        super().__init__(daemon=True)
+        self.batch_size = batch_size
+        self.app = None
+        self._cond = threading.Condition()
+        self._heap = []        # (deadline, trip_id), possibly stale
+        self._deadlines = {}   # trip_id -> deadline currently in force
+        self._stopped = False
+
+    def load(self):
+        """Replaces the schedule with the deadlines of all active trips. Needs an app context."""
+        rows = db.session.query(Trip.id, Trip.expected_end_time).filter(Trip.status == 'active').all()
+        with self._cond:
+            self._deadlines = {trip_id: deadline for trip_id, deadline in rows}
+            self._heap = [(deadline, trip_id) for trip_id, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+            self._cond.notify()
+        return len(rows)
+
+    def schedule(self, trip_id, deadline):
+        with self._cond:
+            self._deadlines[trip_id] = deadline
+            heapq.heappush(self._heap, (deadline, trip_id))
+            if self._heap[0] == (deadline, trip_id):
+                self._cond.notify()
+
+    def cancel(self, trip_id):
+        with self._cond:
+            self._deadlines.pop(trip_id, None)
+            # don't let cancelled entries pile up in the heap
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [(d, t) for t, d in self._deadlines.items()]
+                heapq.heapify(self._heap)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._deadlines)
+
+    def _is_current(self, entry):
+        deadline, trip_id = entry
+        return self._deadlines.get(trip_id) == deadline
 
-def start_scheduler():
-    if not scheduler.running:
-        scheduler.start()
+    def _take_due(self):
+        """Waits until at least one deadline has passed and returns up to batch_size due trip ids."""
+        with self._cond:
+            while not self._stopped:
+                while self._heap and not self._is_current(self._heap[0]):
+                    heapq.heappop(self._heap)
+
+                now = datetime.now()
+                due = []
+                while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+                    entry = heapq.heappop(self._heap)
+                    if self._is_current(entry):
+                        del self._deadlines[entry[1]]
+                        due.append(entry[1])
+                if due:
+                    return due
+
+                timeout = (self._heap[0][0] - now).total_seconds() if self._heap else None
+                self._cond.wait(timeout)
+            return []
+
+    def run(self):
+        while True:
+            due = self._take_due()
+            if not due:
+                return
+            try:
+                with self.app.app_context():
+                    expired = expire_trips(due)
+                    students = {sid: (name, block) for sid, name, block in
+                                db.session.query(Student.id, Student.name, Student.block)
+                                .filter(Student.id.in_({row.student_id for row in expired}))}
+            except Exception as e:
+                print(f"Failed to expire trips {due}: {e}, retrying")
+                retry_at = datetime.now() + RETRY_DELAY
+                for trip_id in due:
+                    self.schedule(trip_id, retry_at)
+                continue
+
+            for row in expired:
+                name, block = students.get(row.student_id, (f"#{row.student_id}", None))
+                print(f"ALERT: Trip {row.id} for Student {name} is LATE!")
+                notifier.submit(name, block, row.direction)
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+expiry_engine = ExpiryEngine()
+
+def start_scheduler(app):
+    """Loads outstanding deadlines from the database and starts the expiry and notification threads."""
+    start_notifier()
+    expiry_engine.app = app
+    with app.app_context():
+        pending = expiry_engine.load()
+    if not expiry_engine.is_alive():
+        expiry_engine.start()
+    return pending
 
-def schedule_trip_check(app, trip_id, run_date):
+def schedule_trip_check(trip_id, run_date):
     """
-    Schedules a check for the trip at the expected end time.
+    Expires the trip at its expected end time unless it is cancelled first.
+    Deadlines already in the past (replayed scans) get REPLAY_GRACE from
+    now instead.
     """
-    scheduler.add_job(
-        func=check_trip_expiry,
-        trigger=DateTrigger(run_date=run_date),
-        args=[app, trip_id],
-        id=str(trip_id),
-        replace_existing=True
-    )
+    now = datetime.now()
+    if run_date <= now:
+        run_date = now + REPLAY_GRACE
+    expiry_engine.schedule(trip_id, run_date)
 
 def cancel_trip_check(trip_id):
     """
-    Cancels the scheduled check if the student arrives on time.
+    Cancels the check if the student arrives on time.
     """
-    job_id = str(trip_id)
-    if scheduler.get_job(job_id):
-        scheduler.remove_job(job_id)
+    expiry_engine.cancel(trip_id)
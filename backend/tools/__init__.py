@@ -0,0 +1,4 @@
+"""
+Benchmarks, checks and maintenance scripts for the backend. Run them
+from backend/ as modules, e.g. python -m tools.query_audit --help.
+"""
@@ -0,0 +1,95 @@
+"""
+App and seed data shared by the scripts in this package.
+"""
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta
+from flask import Flask
+from sqlalchemy import insert
+from config import Config
+from database import db, init_db
+from models import Student, StudentChange, Trip, BlockLimit, pack_encoding, ENCODING_DIM
+from migrations import run_migrations
+from routes import api
+
+BLOCKS = ['A', 'B', 'C', 'D1', 'D2']
+DIRECTIONS = ['Hostel -> Library', 'Library -> Hostel']
+
+def temp_database(name):
+    """SQLite URL of a new file in a fresh temporary directory."""
+    return 'sqlite:///' + os.path.join(tempfile.mkdtemp(), name)
+
+def build_app(url, **config):
+    """The backend's routes on the database at `url`, without the startup work of app.create_app."""
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config.update(config)
+    init_db(app)
+    app.register_blueprint(api)
+    app.logger.setLevel(logging.CRITICAL)
+    return app
+
+def prepare(app):
+    """Brings the app's database up to the current schema, as starting the backend would."""
+    with app.app_context():
+        db.create_all()
+        run_migrations()
+        return db.engine
+
+def seed_students(count, encoding=None, regno='REG{:06d}'):
+    """
+    Inserts `count` students, spread over BLOCKS, with their change log
+    entries. encoding(i) gives the i-th student's encoding (all zeros by
+    default). Returns their ids, which on an empty database are 1..count.
+    """
+    zeros = pack_encoding([0.0] * ENCODING_DIM)
+    created = datetime(2025, 6, 1)
+    ids = list(db.session.scalars(insert(Student).returning(Student.id, sort_by_parameter_order=True), [
+        {'name': f"Student {i}", 'block': BLOCKS[i % len(BLOCKS)], 'regno': regno.format(i),
+         'face_encoding': pack_encoding(encoding(i)) if encoding else zeros, 'created_at': created}
+        for i in range(1, count + 1)
+    ]))
+    db.session.execute(insert(StudentChange), [
+        {'student_id': sid, 'op': 'upsert', 'changed_at': created} for sid in ids
+    ])
+    db.session.commit()
+    return ids
+
+def seed_block_limits(minutes=15):
+    for block in BLOCKS:
+        db.session.add(BlockLimit(block_name=block, minutes=minutes))
+    db.session.commit()
+
+def trip_row(student_id, start_time, took_minutes=None, limit_minutes=15, direction=DIRECTIONS[0]):
+    """
+    Trip columns for insert_trips: still active if took_minutes is None,
+    otherwise completed, or late if it took longer than limit_minutes.
+    """
+    start_location, end_location = direction.split(' -> ')
+    late = took_minutes is not None and took_minutes > limit_minutes
+    return {
+        'student_id': student_id,
+        'start_time': start_time,
+        'expected_end_time': start_time + timedelta(minutes=limit_minutes),
+        'end_time': None if took_minutes is None else start_time + timedelta(minutes=took_minutes),
+        'status': 'active' if took_minutes is None else ('late' if late else 'completed'),
+        'direction': direction,
+        'start_location': start_location,
+        'end_location': end_location,
+        'exceeded_limit': late,
+        'is_alert': late,
+    }
+
+def insert_trips(rows, batch_size=50_000):
+    """Inserts trip_row dicts in batches, without going through the ORM."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(Trip.__table__.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(Trip.__table__.insert(), batch)
+    db.session.commit()
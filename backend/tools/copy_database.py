@@ -0,0 +1,73 @@
+"""
+Copies an existing SQLite database into another database, e.g. the
+PostgreSQL server named by DATABASE_URL:
+
+    python -m tools.copy_database hostel_system.db [--target URL]
+
+Both sides are brought up to the current schema first (create_all plus
+migrations, as starting the backend would). The target must be empty.
+"""
+import argparse
+import sys
+from sqlalchemy import text, func, select
+from config import Config
+from database import db
+from tools.common import build_app, prepare
+
+BATCH_SIZE = 1000
+
+def copy_table(table, source, target):
+    copied = 0
+    with source.connect() as src, target.begin() as dst:
+        rows = src.execution_options(stream_results=True).execute(
+            table.select().order_by(*table.primary_key.columns)
+        ).mappings()
+        for chunk in rows.partitions(BATCH_SIZE):
+            dst.execute(table.insert(), [dict(row) for row in chunk])
+            copied += len(chunk)
+    return copied
+
+def reset_sequences(target):
+    """Moves PostgreSQL id sequences past the copied ids so new rows don't collide."""
+    with target.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if 'id' in table.c and table.c.id.primary_key:
+                conn.execute(
+                    text(f"SELECT setval(pg_get_serial_sequence(:name, 'id'), "
+                         f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table.name}"),
+                    {'name': table.name}
+                )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source', help="SQLite file (or any database URL) to copy from")
+    parser.add_argument('--target', default=Config.SQLALCHEMY_DATABASE_URI,
+                        help="database URL to copy into (default: DATABASE_URL)")
+    args = parser.parse_args()
+
+    source_url = args.source if '://' in args.source else 'sqlite:///' + args.source
+    if source_url == args.target:
+        print("Source and target are the same database.")
+        return 1
+
+    source = prepare(build_app(source_url))
+    target = prepare(build_app(args.target))
+
+    with target.connect() as conn:
+        non_empty = [t.name for t in db.metadata.sorted_tables
+                     if conn.execute(select(func.count()).select_from(t)).scalar()]
+    if non_empty:
+        print(f"Target already has data in: {', '.join(non_empty)}. Aborting.")
+        return 1
+
+    # parents before children, so foreign keys hold throughout
+    for table in db.metadata.sorted_tables:
+        print(f"{table.name}: {copy_table(table, source, target)} rows")
+
+    if target.dialect.name == 'postgresql':
+        reset_sequences(target)
+    print("Done. Start the backend with DATABASE_URL pointing at the target.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Concurrency benchmark for the SQLite setup.
+
+Runs scan requests from several threads while another thread commits
+trip updates the way the expiry scheduler does, once with SQLite's
+defaults and once with Config.SQLITE_PRAGMAS, each on a fresh database:
+
+    python -m tools.db_benchmark [--threads N] [--seconds S] [--students N]
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from config import Config
+from database import db
+from models import Trip
+from trip_state import active_trips
+from tools.common import build_app, prepare, temp_database, seed_students, seed_block_limits, trip_row, insert_trips
+
+def seed(student_count, filler_count):
+    seed_students(student_count + filler_count)
+    seed_block_limits()
+    # active trips for students nobody scans; the writer thread churns these
+    start = datetime.now()
+    insert_trips(trip_row(sid, start) for sid in range(student_count + 1, student_count + filler_count + 1))
+    return [trip_id for trip_id, in db.session.query(Trip.id).filter(Trip.status == 'active')]
+
+def scanner(app, student_ids, deadline, latencies, errors):
+    client = app.test_client()
+    location = {sid: 'Library' for sid in student_ids}
+    while time.time() < deadline:
+        sid = random.choice(student_ids)
+        # older than the live window, so no gate is opened
+        scanned_at = (datetime.now() - timedelta(seconds=60)).isoformat()
+        start = time.perf_counter()
+        res = client.post(f"/scan_{location[sid].lower()}", json={'student_id': sid, 'scanned_at': scanned_at})
+        latencies.append(time.perf_counter() - start)
+        if res.status_code >= 500:
+            errors.append(res.status_code)
+        else:
+            location[sid] = 'Hostel' if location[sid] == 'Library' else 'Library'
+
+def expiry_writer(app, trip_ids, deadline, commits):
+    """Marks trips late and back, one commit each, like a burst of expiry checks."""
+    with app.app_context():
+        while time.time() < deadline:
+            trip = db.session.get(Trip, random.choice(trip_ids))
+            trip.status = 'late' if trip.status == 'active' else 'active'
+            trip.is_alert = trip.status == 'late'
+            try:
+                db.session.commit()
+                commits.append(1)
+            except Exception:
+                db.session.rollback()
+
+def run(label, pragmas, args):
+    app = build_app(temp_database('bench.db'), SQLITE_PRAGMAS=pragmas)
+    prepare(app)
+    with app.app_context():
+        filler = seed(args.students, 200)
+        active_trips.rebuild()
+
+    deadline = time.time() + args.seconds
+    latencies, errors, commits = [], [], []
+    per_thread = args.students // args.threads
+    threads = [
+        threading.Thread(target=scanner, args=(app, list(range(1 + i * per_thread, 1 + (i + 1) * per_thread)),
+                                               deadline, latencies, errors))
+        for i in range(args.threads)
+    ]
+    threads.append(threading.Thread(target=expiry_writer, args=(app, filler, deadline, commits)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"{label:8s} scans/s={len(latencies) / args.seconds:7.1f}  p50={p50:6.1f}ms  p99={p99:7.1f}ms  "
+          f"errors={len(errors)}  expiry commits/s={len(commits) / args.seconds:7.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--students', type=int, default=400)
+    args = parser.parse_args()
+
+    run('default', {}, args)
+    run('tuned', Config.SQLITE_PRAGMAS, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Bytes and CPU saved by conditional GETs on the dashboard's read endpoints.
+
+Seeds a throwaway SQLite database, then polls each endpoint the way the
+dashboard does (every poll, nothing changing in between), once plainly
+and once sending back the ETag of the previous answer:
+
+    python -m tools.etag_benchmark [--polls N] [--students N] [--trips N] [--scan-every N]
+
+With --scan-every, a scan is made every N polls, so the conditional run
+also shows resources being refetched once they actually change.
+"""
+import argparse
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from models import ENCODING_DIM
+from trip_state import active_trips
+from tools.common import (DIRECTIONS, build_app, prepare, temp_database, seed_students, seed_block_limits,
+                          trip_row, insert_trips)
+
+ENDPOINTS = ['active_timers', 'alerts', 'trip_logs', 'get_encodings', 'admin/get_limits']
+
+def seed(student_count, trip_count):
+    rng = random.Random(5)
+    seed_students(student_count, encoding=lambda i: [rng.uniform(-0.2, 0.2) for _ in range(ENCODING_DIM)])
+    seed_block_limits()
+
+    now = datetime.now()
+    finished = (trip_row(rng.randint(1, student_count), now - timedelta(minutes=30 * (trip_count - i)),
+                         20 if rng.random() < 0.1 else 10)
+                for i in range(trip_count))
+    # a quarter of the students are out right now
+    out = (trip_row(sid, now, direction=DIRECTIONS[1]) for sid in range(1, student_count // 4 + 1))
+    insert_trips(itertools.chain(finished, out))
+
+def poll(client, args, conditional, location):
+    etags = {}
+    sent = {endpoint: 0 for endpoint in ENDPOINTS}
+    full = {endpoint: 0 for endpoint in ENDPOINTS}
+    scanner = args.students // 4 + 1  # a student with no active trip
+
+    start = time.process_time()
+    for i in range(args.polls):
+        if args.scan_every and i and i % args.scan_every == 0:
+            where = location.get(scanner, 'Hostel')
+            # older than the live window, so no gate is opened
+            scanned_at = (datetime.now() - timedelta(seconds=60)).isoformat()
+            client.post(f"/scan_{where.lower()}", json={'student_id': scanner, 'scanned_at': scanned_at})
+            location[scanner] = 'Library' if where == 'Hostel' else 'Hostel'
+        for endpoint in ENDPOINTS:
+            headers = {'If-None-Match': etags[endpoint]} if conditional and endpoint in etags else {}
+            res = client.get(f"/{endpoint}", headers=headers)
+            sent[endpoint] += len(res.data)
+            if res.status_code == 200:
+                full[endpoint] += 1
+                etags[endpoint] = res.headers['ETag']
+    cpu = time.process_time() - start
+    return sent, full, cpu
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--students', type=int, default=500)
+    parser.add_argument('--trips', type=int, default=5000)
+    parser.add_argument('--scan-every', type=int, default=0)
+    args = parser.parse_args()
+
+    app = build_app(temp_database('etag.db'))
+    prepare(app)
+    with app.app_context():
+        seed(args.students, args.trips)
+        active_trips.rebuild()
+
+    client = app.test_client()
+    location = {}
+    results = {label: poll(client, args, conditional, location) for label, conditional in
+               (('plain', False), ('etag', True))}
+
+    print(f"{args.polls} polls of each endpoint")
+    print(f"{'endpoint':18s} {'plain bytes':>12s} {'etag bytes':>12s} {'full answers':>13s}")
+    for endpoint in ENDPOINTS:
+        print(f"{endpoint:18s} {results['plain'][0][endpoint]:12d} {results['etag'][0][endpoint]:12d} "
+              f"{results['etag'][1][endpoint]:13d}")
+    for label, (sent, _, cpu) in results.items():
+        print(f"{label:6s} total {sum(sent.values()):12d} bytes, "
+              f"{cpu * 1000 / (args.polls * len(ENDPOINTS)):6.2f} ms CPU per request")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Throughput check for late-trip notifications against a local stub ntfy
+server, so no real server or phone is involved.
+
+Sends a curfew wave of late alerts three ways and reports wall time,
+HTTP requests and TCP connections the stub saw:
+  direct  - one requests.post per alert, as the scheduler used to do
+  pooled  - AlertNotifier with digests off (window 0)
+  digest  - AlertNotifier with the given digest window
+
+    python -m tools.notify_benchmark [--alerts N] [--delay MS] [--fail-rate F] [--window S]
+
+--delay makes the stub slow to answer and --fail-rate makes it answer
+503 to that fraction of requests, to exercise the retries.
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from notifier import AlertNotifier, format_alerts
+from tools.common import BLOCKS
+
+class StubNtfy(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, delay, fail_rate):
+        super().__init__(('127.0.0.1', 0), StubHandler)
+        self.delay = delay
+        self.fail_rate = fail_rate
+        self.rng = random.Random(3)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.delivered = 0
+            self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}/alerts"
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like ntfy
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        server = self.server
+        time.sleep(server.delay)
+        with server.lock:
+            server.requests += 1
+            server.connections.add(self.client_address)
+            failed = server.rng.random() < server.fail_rate
+            if not failed:
+                server.delivered += body.count(b'\n') + 1
+        reply = b'{}'
+        self.send_response(503 if failed else 200)
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, *args):
+        pass
+
+def direct(stub, alerts):
+    for name, block, direction in alerts:
+        title, body = format_alerts(block, [(name, block, direction)])
+        try:
+            requests.post(stub.url, data=body.encode('utf-8'),
+                          headers={"Title": title, "Priority": "high", "Tags": "warning,clock1"})
+        except requests.RequestException:
+            pass
+
+def queued(stub, alerts, window):
+    notifier = AlertNotifier(stub.url, window=window, max_pending=len(alerts), backoff=0.05)
+    notifier.start()
+    for alert in alerts:
+        notifier.submit(*alert)
+    notifier.stop(timeout=None)
+    return notifier.stats()
+
+def run(label, stub, alerts, send):
+    stub.reset()
+    start = time.perf_counter()
+    stats = send()
+    elapsed = time.perf_counter() - start
+    print(f"{label:7s} {elapsed:7.2f}s  requests={stub.requests:5d}  connections={len(stub.connections):4d}  "
+          f"alerts delivered={stub.delivered}/{len(alerts)}" + (f"  failed messages={stats['failed']}" if stats else ""))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--alerts', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=20, help="stub response time in ms")
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--window', type=float, default=1.0)
+    args = parser.parse_args()
+
+    stub = StubNtfy(args.delay / 1000, args.fail_rate)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    alerts = [(f"Student {i}", BLOCKS[i % len(BLOCKS)], "Hostel -> Library") for i in range(args.alerts)]
+
+    run('direct', stub, alerts, lambda: direct(stub, alerts))
+    run('pooled', stub, alerts, lambda: queued(stub, alerts, 0))
+    run('digest', stub, alerts, lambda: queued(stub, alerts, args.window))
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
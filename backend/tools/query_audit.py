@@ -0,0 +1,114 @@
+"""
+Query plan audit for the trip and student tables.
+
+Seeds a throwaway SQLite database (a million trips by default), runs
+EXPLAIN QUERY PLAN for the queries the backend issues and reports any
+that fall back to a full table scan or sort the whole result. Exits
+non-zero if one does, so it can run before a release:
+
+    python -m tools.query_audit [--trips N] [--students N] [--keep PATH]
+"""
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from database import db
+from models import Student, Trip, StudentChange
+from routes import trip_log_query, alerts_query, encode_cursor
+from tools.common import DIRECTIONS, build_app, prepare, temp_database, seed_students, trip_row, insert_trips
+
+def seed(student_count, trip_count):
+    seed_students(student_count)
+    rng = random.Random(7)
+    start = datetime.now() - timedelta(days=365)
+    step = timedelta(days=365) / trip_count
+
+    def trips():
+        for i in range(trip_count):
+            late = rng.random() < 0.05
+            active = i >= trip_count - 200
+            # one active trip per student, as uq_trip_active_student requires
+            student_id = (i % student_count) + 1 if active else rng.randint(1, student_count)
+            yield trip_row(student_id, start + step * i, None if active else (20 if late else 10),
+                           direction=DIRECTIONS[i % 2])
+
+    insert_trips(trips())
+
+def audited_queries():
+    """(description, query) for each query shape issued by routes.py, scheduler.py and trip_state.py."""
+    now = datetime.now()
+    last = Trip.with_student().filter(Trip.status != 'active').order_by(Trip.start_time.desc()).first()
+    cursor = encode_cursor(last)
+    week = {'since': (now - timedelta(days=7)).isoformat(), 'until': now.isoformat()}
+
+    return [
+        ("student by reg no", Student.query.filter_by(regno='REG000042')),
+        ("students by id (scan_batch)", Student.query.filter(Student.id.in_([1, 2, 3]))),
+        ("student roster, next page", Student.roster().filter(Student.id > 100).order_by(Student.id).limit(51)),
+        ("trips by id (scans)", Trip.query.filter(Trip.id.in_([1, 2, 3]))),
+        ("active trip for student", Trip.query.filter_by(student_id=42, status='active')),
+        ("active trips with students (startup)",
+         db.session.query(Trip, Student).join(Student, Trip.student_id == Student.id).filter(Trip.status == 'active')),
+        ("active trip ids (consistency check)",
+         db.session.query(Trip.id, Trip.student_id).filter(Trip.status == 'active')),
+        ("active trip deadlines (expiry engine startup)",
+         db.session.query(Trip.id, Trip.expected_end_time).filter(Trip.status == 'active')),
+        ("expire due trips",
+         db.update(Trip).where(Trip.id.in_([1, 2, 3]), Trip.status == 'active')
+         .values(status='late', is_alert=True).returning(Trip.id, Trip.student_id, Trip.direction)),
+        ("trip logs, first page", trip_log_query({}).limit(51)),
+        ("trip logs, next page", trip_log_query({'cursor': cursor}).limit(51)),
+        ("trip logs, by status", trip_log_query({'status': 'late', 'cursor': cursor}).limit(51)),
+        ("trip logs, by block", trip_log_query({'block': 'C'}).limit(51)),
+        ("trip logs, by direction", trip_log_query({'direction': 'Hostel -> Library'}).limit(51)),
+        ("trip logs, date range", trip_log_query(week).limit(51)),
+        ("trip logs, name search", trip_log_query({'q': 'student 42'}).limit(51)),
+        ("alerts", alerts_query().limit(200)),
+        ("encoding changes", StudentChange.query.filter(StudentChange.id > 10).order_by(StudentChange.id)),
+    ]
+
+def explain(query):
+    statement = getattr(query, 'statement', query)
+    sql = statement.compile(dialect=db.engine.dialect, compile_kwargs={'literal_binds': True})
+    with db.engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+def problems(plan):
+    """Plan steps that read a whole table, or sort instead of walking an index."""
+    bad = []
+    for step in plan:
+        if step.startswith('SCAN ') and 'USING' not in step:
+            bad.append(step)
+        elif 'TEMP B-TREE FOR ORDER BY' in step:
+            bad.append(step)
+    return bad
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--trips', type=int, default=1_000_000)
+    parser.add_argument('--students', type=int, default=3000)
+    parser.add_argument('--keep', help="write the seeded database here instead of a temp file")
+    args = parser.parse_args()
+
+    url = 'sqlite:///' + args.keep if args.keep else temp_database('audit.db')
+    app = build_app(url)
+    prepare(app)
+
+    failed = 0
+    with app.app_context():
+        print(f"Seeding {args.trips} trips for {args.students} students into {url}...")
+        seed(args.students, args.trips)
+
+        for description, query in audited_queries():
+            plan = explain(query)
+            bad = problems(plan)
+            failed += bool(bad)
+            print(f"{'FAIL' if bad else 'ok  '} {description}")
+            for step in plan:
+                print(f"       {'!' if step in bad else ' '} {step}")
+
+    print(f"{failed} queries need attention." if failed else "All queries use indexes.")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
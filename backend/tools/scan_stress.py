@@ -0,0 +1,133 @@
+"""
+Concurrency stress check for scan handling.
+
+Starts the backend on a throwaway database (or DATABASE_URL if set),
+fires thousands of scans from many threads, including duplicate sends
+of the same scan_id and /scan_batch requests, and then verifies:
+  - no student ever has more than one active trip
+  - every scan_id was applied once and always got the same answer
+  - the in-memory active-trip table matches the database
+
+    python -m tools.scan_stress [--scans N] [--threads N] [--students N]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'stress.db'))
+
+import requests
+from werkzeug.serving import make_server
+from app import create_app
+from database import db
+from models import Trip, ScanReceipt
+from trip_state import active_trips
+from tools.common import seed_students
+
+LOCATIONS = ("Library", "Hostel")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scans', type=int, default=3000)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--students', type=int, default=40)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        student_ids = seed_students(args.students, regno="STRESS{:05d}")
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}"
+    session = requests.Session()
+    session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=args.threads))
+
+    answers = defaultdict(list)  # scan_id -> [(code, body), ...]
+    lock = threading.Lock()
+    rng = random.Random(1)
+
+    def event():
+        return {'student_id': rng.choice(student_ids), 'location': rng.choice(LOCATIONS), 'scan_id': uuid.uuid4().hex}
+
+    def single(scan):
+        res = session.post(f"{base}/scan_{scan['location'].lower()}", json=scan, timeout=30)
+        body = res.json()
+        with lock:
+            answers[scan['scan_id']].append((res.status_code, body))
+
+    def batch(scans):
+        res = session.post(f"{base}/scan_batch", json={'events': scans}, timeout=30)
+        if res.status_code != 200:
+            with lock:
+                for scan in scans:
+                    answers[scan['scan_id']].append((res.status_code, res.json()))
+            return
+        for scan, result in zip(scans, res.json()['results']):
+            result = dict(result)
+            code = result.pop('code')
+            with lock:
+                answers[scan['scan_id']].append((code, result))
+
+    jobs = []
+    while sum(len(j[1]) if j[0] is batch else 1 for j in jobs) < args.scans:
+        if rng.random() < 0.1:
+            jobs.append((batch, [event() for _ in range(5)]))
+            continue
+        scan = event()
+        # roughly a third of scans are sent again (a gate retry or a replay)
+        for _ in range(rng.choice((1, 1, 2, 3))):
+            jobs.append((single, scan))
+    rng.shuffle(jobs)
+
+    with ThreadPoolExecutor(args.threads) as pool:
+        for future in [pool.submit(fn, arg) for fn, arg in jobs]:
+            future.result()
+    server.shutdown()
+
+    failures = []
+    with app.app_context():
+        duplicates = db.session.query(Trip.student_id).filter(Trip.status == 'active') \
+            .group_by(Trip.student_id).having(db.func.count() > 1).all()
+        if duplicates:
+            failures.append(f"students with several active trips: {[d[0] for d in duplicates]}")
+
+        receipts = {r.scan_id: r for r in ScanReceipt.query}
+        conflicts = sum(1 for sends in answers.values() for code, _ in sends if code == 409)
+        for scan_id, sends in answers.items():
+            applied = [(code, body) for code, body in sends if code != 409]
+            if any(answer != applied[0] for answer in applied):
+                failures.append(f"scan {scan_id} got different answers: {applied}")
+            if applied and scan_id not in receipts:
+                failures.append(f"scan {scan_id} answered but has no receipt")
+
+        # a trip is written by every scan that started one (201) and by every
+        # scan that, applied late, replaced a phantom trip (200 with a trip_id)
+        started = sum(1 for r in receipts.values() if r.code == 201 or 'trip_id' in json.loads(r.body))
+        trips = Trip.query.count()
+        if started != trips:
+            failures.append(f"{trips} trips exist but {started} scans wrote one")
+
+        report = active_trips.check_consistency()
+        if not report['consistent']:
+            failures.append(f"active-trip table out of sync: {report}")
+
+    sends = sum(len(v) for v in answers.values())
+    print(f"{sends} sends of {len(answers)} scans, {len(receipts)} applied, {trips} trips, "
+          f"{report['database_active']} active, {conflicts} conflicts returned 409")
+    for failure in failures[:20]:
+        print("FAIL", failure)
+    print("OK" if not failures else f"{len(failures)} problems")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Statement count check for the list endpoints.
+
+Serves /trip_logs, /alerts and /active_timers from a small and a large
+throwaway SQLite database and counts the SQL statements each request
+issues, through SQLAlchemy's before_cursor_execute event. A list that
+lazy-loads per row (an N+1) issues more statements as it grows; the check
+fails, exiting non-zero, if any endpoint's count differs between sizes:
+
+    python -m tools.statement_count_check [--small N] [--large N]
+
+On SQLite /active_timers is answered from the in-memory active trip
+table, so it is expected to issue no statements at all.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from database import db
+from routes import TRIP_LOG_MAX_PAGE_SIZE, ALERTS_MAX_LIMIT
+from trip_state import active_trips
+from tools.common import build_app, prepare, temp_database, seed_students, trip_row, insert_trips
+
+ENDPOINTS = [
+    f'/trip_logs?limit={TRIP_LOG_MAX_PAGE_SIZE}',
+    f'/alerts?limit={ALERTS_MAX_LIMIT}',
+    '/active_timers',
+]
+
+def seed(rows):
+    """`rows` students, each with one finished late trip and one active trip."""
+    now = datetime.now()
+    insert_trips(
+        trip
+        for sid in seed_students(rows)
+        for trip in (trip_row(sid, now - timedelta(days=1, minutes=sid), took_minutes=20),
+                     trip_row(sid, now - timedelta(minutes=sid % 10)))
+    )
+
+def count_statements(rows):
+    """{endpoint: statements issued by one request} against a database of `rows` students."""
+    app = build_app(temp_database('statements.db'))
+    prepare(app)
+    with app.app_context():
+        seed(rows)
+        active_trips.rebuild()
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+
+    counts = {}
+    client = app.test_client()
+    for url in ENDPOINTS:
+        client.get(url)  # warm up the connection pool
+        del statements[:]
+        response = client.get(url)
+        if response.status_code != 200:
+            raise SystemExit(f"{url} answered {response.status_code}")
+        counts[url] = len(statements)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--small', type=int, default=10)
+    parser.add_argument('--large', type=int, default=1000)
+    args = parser.parse_args()
+
+    small = count_statements(args.small)
+    large = count_statements(args.large)
+
+    failed = 0
+    print(f"{'endpoint':<40} {args.small:>8} {args.large:>8}")
+    for url in ENDPOINTS:
+        bad = small[url] != large[url]
+        failed += bad
+        print(f"{url:<40} {small[url]:>8} {large[url]:>8}  {'FAIL' if bad else 'ok'}")
+
+    print(f"{failed} endpoints issue more statements as rows grow." if failed
+          else "Statement counts do not depend on the number of rows.")
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database import db
+from models import Trip, Student
+from event_feed import EventFeed
+from change_counters import change_counters
+
+PENDING_KEY = 'active_trip_changes'
+
+def trip_entry(trip, student):
+    """Same shape as Trip.to_dict, built without touching trip.student."""
+    return {
+        'id': trip.id,
+        'student_id': trip.student_id,
+        'student_name': student.name,
+        'reg_no': student.regno,
+        'student_block': student.block,
+        'start_time': trip.start_time.isoformat(),
+        'expected_end_time': trip.expected_end_time.isoformat(),
+        'end_time': trip.end_time.isoformat() if trip.end_time else None,
+        'status': trip.status,
+        'direction': trip.direction,
+        'start_location': trip.start_location,
+        'end_location': trip.end_location,
+        'exceeded_limit': bool(trip.exceeded_limit),
+        'is_alert': bool(trip.is_alert)
+    }
+
+class ActiveTripTable:
+    """
+    Authoritative in-memory view of active trips, keyed by student id.
+
+    Rebuilt from the database at startup. Code that starts or ends a trip
+    stages the change on the current session (stage_start / stage_finish);
+    it is applied here only once that session commits, and dropped on
+    rollback, so the table never runs ahead of the database. This assumes
+    one backend process owns the database; with a server database, which
+    several processes may share, routes read active trips from the
+    database instead (see load_active_trips and active_trip_list).
+
+    Every applied change is also published on `feed` as a 'started',
+    'completed', 'late' or 'removed' event carrying the trip entry, and
+    bumps the change counters of the resources it affects. A rebuild
+    publishes a fresh 'snapshot' instead, so subscribers start over.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_student = {}
+        self.feed = EventFeed()
+
+    def rebuild(self):
+        rows = db.session.query(Trip, Student).join(Student, Trip.student_id == Student.id) \
+            .filter(Trip.status == 'active').all()
+        table = {trip.student_id: trip_entry(trip, student) for trip, student in rows}
+        with self._lock:
+            self._by_student = table
+            self.feed.publish('snapshot', list(table.values()))
+            change_counters.bump('active_trips')
+        return len(table)
+
+    def get(self, student_id):
+        with self._lock:
+            return self._by_student.get(student_id)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._by_student.values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._by_student)
+
+    def subscribe(self):
+        """
+        Returns (subscription, last event id, snapshot of the active trips)
+        taken together, so the subscription's events follow on exactly
+        from the snapshot.
+        """
+        with self._lock:
+            sub, last_id = self.feed.subscribe()
+            return sub, last_id, list(self._by_student.values())
+
+    def stage_start(self, trip, student):
+        db.session.info.setdefault(PENDING_KEY, []).append(('start', trip.student_id, trip_entry(trip, student)))
+
+    def stage_finish(self, trip, status, end_time=None):
+        """status is 'completed' or 'late'; end_time is None for trips expired without a scan."""
+        db.session.info.setdefault(PENDING_KEY, []).append(('finish', trip.student_id, (trip.id, status, end_time)))
+
+    def stage_remove_student(self, student_id):
+        db.session.info.setdefault(PENDING_KEY, []).append(('finish', student_id, (None, 'removed', None)))
+
+    def stage_replace(self, phantom, trip, student):
+        """
+        The active trip `phantom` was cancelled in favour of the finished
+        `trip` a replayed scan revealed; publishes 'removed' for the one
+        and 'completed' or 'late' for the other.
+        """
+        db.session.info.setdefault(PENDING_KEY, []).append(('replace', trip.student_id, (phantom.id, trip_entry(trip, student))))
+
+    def _apply(self, changes):
+        with self._lock:
+            for op, student_id, value in changes:
+                if op == 'start':
+                    self._by_student[student_id] = value
+                    self.feed.publish('started', value)
+                    change_counters.bump('active_trips', 'trip_logs')
+                    continue
+
+                if op == 'replace':
+                    phantom_id, entry = value
+                    current = self._by_student.get(student_id)
+                    if current and current['id'] == phantom_id:
+                        del self._by_student[student_id]
+                        self.feed.publish('removed', current)
+                    self.feed.publish(entry['status'], entry)
+                    change_counters.bump('active_trips', 'trip_logs', *(['alerts'] if entry['is_alert'] else []))
+                    continue
+
+                trip_id, status, end_time = value
+                current = self._by_student.get(student_id)
+                if current and (trip_id is None or current['id'] == trip_id):
+                    del self._by_student[student_id]
+                    late = status == 'late'
+                    self.feed.publish(status, dict(
+                        current,
+                        status=current['status'] if status == 'removed' else status,
+                        end_time=end_time.isoformat() if end_time else None,
+                        exceeded_limit=late,
+                        is_alert=late
+                    ))
+                    change_counters.bump('active_trips', 'trip_logs', *(['alerts'] if late else []))
+
+    def check_consistency(self):
+        """
+        Compares the table with the database. Returns the trip ids found
+        only in the database, only in memory, and in both but for a
+        different student.
+        """
+        db_trips = dict(db.session.query(Trip.id, Trip.student_id).filter(Trip.status == 'active').all())
+        with self._lock:
+            mem_trips = {entry['id']: sid for sid, entry in self._by_student.items()}
+
+        return {
+            'consistent': db_trips == mem_trips,
+            'database_active': len(db_trips),
+            'memory_active': len(mem_trips),
+            'missing_from_memory': sorted(set(db_trips) - set(mem_trips)),
+            'unknown_to_database': sorted(set(mem_trips) - set(db_trips)),
+            'student_mismatch': sorted(t for t in set(db_trips) & set(mem_trips) if db_trips[t] != mem_trips[t])
+        }
+
+active_trips = ActiveTripTable()
+
+@event.listens_for(Session, 'after_commit')
+def _apply_staged_changes(session):
+    changes = session.info.pop(PENDING_KEY, None)
+    if changes:
+        active_trips._apply(changes)
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_staged_changes(session, previous_transaction):
+    session.info.pop(PENDING_KEY, None)
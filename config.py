@@ -9,4 +9,26 @@ class Config:
     API_BASE_URL = os.getenv("API_BASE_URL", "http://localhost:5000")
     LIBRARY_EXIT_ENDPOINT = os.getenv("LIB_ENDPOINT", f"{API_BASE_URL}/scan_library")
     HOSTEL_ENTRY_ENDPOINT = os.getenv("HOSTEL_ENDPOINT", f"{API_BASE_URL}/scan_hostel")
-    ARDUINO_PORT = os.getenv("ARDUINO_PORT", "COM4")
\ No newline at end of file
+    ARDUINO_PORT = os.getenv("ARDUINO_PORT", "COM4")
+    # "exact" brute-force matching or "ivf" approximate index for large galleries
+    MATCHER_BACKEND = os.getenv("MATCHER_BACKEND", "exact")
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE", "8"))
+    # recognition threads per gate and how often (seconds) gates print pipeline stats
+    GATE_RECOGNITION_WORKERS = int(os.getenv("GATE_RECOGNITION_WORKERS", "1"))
+    GATE_STATS_INTERVAL = int(os.getenv("GATE_STATS_INTERVAL", "30"))
+    # re-encode an already identified, tracked face every N frames (0 disables tracking)
+    GATE_REVERIFY_EVERY = int(os.getenv("GATE_REVERIFY_EVERY", "15"))
+    # seconds between incremental gallery syncs on the gate laptops
+    GALLERY_SYNC_INTERVAL = int(os.getenv("GALLERY_SYNC_INTERVAL", "5"))
+    # local copy of the gallery so gates start without waiting on the backend
+    GALLERY_CACHE_PATH = os.getenv("GALLERY_CACHE_PATH", str(base_dir / "gallery_cache.bin"))
+    # local journal of scans not yet accepted by the backend, and how often (seconds) to retry them
+    SCAN_JOURNAL_PATH = os.getenv("SCAN_JOURNAL_PATH", str(base_dir / "scan_journal.db"))
+    SCAN_REPLAY_INTERVAL = int(os.getenv("SCAN_REPLAY_INTERVAL", "10"))
+    # shared HTTP session used by the gates and the dashboard (see http_client.py):
+    # default timeout (seconds), retries of failed connections and idempotent
+    # requests, pooled keep-alive connections, and whether to accept gzip responses
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))
+    HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_COMPRESSION = os.getenv("HTTP_COMPRESSION", "1") == "1"
@@ -1,21 +1,79 @@
-import requests
 import pandas as pd
 import streamlit as st
 from datetime import datetime
+from urllib.parse import urlencode
 from config import Config
+from http_client import session
+from dashboard.live_feed import LiveFeed
 
 API_BASE_URL = Config.API_BASE_URL
 REFRESH_RATE = 3
+RESPONSE_CACHE_SIZE = 256
+
+@st.cache_resource
+def response_cache():
+    """endpoint -> (ETag, body) of the last full response, shared by all sessions."""
+    return {}
+
+def get_json(endpoint, timeout=2):
+    """
+    GETs an endpoint, revalidating the last copy with If-None-Match, so an
+    unchanged resource comes back as an empty 304 and the cached body is
+    reused. Returns [] for other non-200 answers.
+    """
+    cache = response_cache()
+    cached = cache.get(endpoint)
+    headers = {'If-None-Match': cached[0]} if cached else {}
+    res = session.get(f"{API_BASE_URL}/{endpoint}", headers=headers, timeout=timeout)
+    if res.status_code == 304 and cached:
+        return cached[1]
+    if res.status_code != 200:
+        return []
+
+    body = res.json()
+    if 'ETag' in res.headers:
+        if endpoint not in cache and len(cache) >= RESPONSE_CACHE_SIZE:
+            cache.pop(next(iter(cache)), None)
+        cache[endpoint] = (res.headers['ETag'], body)
+    return body
 
 @st.cache_data(ttl=REFRESH_RATE)
 def fetch_api_data(endpoint):
     try:
-        res = requests.get(f"{API_BASE_URL}/{endpoint}", timeout=2)
-        return res.json() if res.status_code == 200 else []
+        return get_json(endpoint)
     except Exception as e:
         st.error(f"Backend Connection Error: {e}")
         return []
 
+@st.cache_resource
+def get_live_feed():
+    """The /events listener shared by every session of this dashboard process."""
+    feed = LiveFeed(API_BASE_URL)
+    feed.start()
+    return feed
+
+def fetch_active_trips():
+    """Active trips from the live feed, or a poll of /active_timers while it is disconnected."""
+    feed = get_live_feed()
+    return feed.active_trips() if feed.connected else fetch_api_data("active_timers")
+
+def fetch_alerts():
+    feed = get_live_feed()
+    return feed.alerts() if feed.connected else fetch_api_data("alerts")
+
+def paged_endpoint(path, cursor=None, **filters):
+    """Builds the query for one page of a cursor-paged endpoint; empty filters are left out."""
+    params = {k: v for k, v in filters.items() if v}
+    if cursor:
+        params['cursor'] = cursor
+    return f"{path}?{urlencode(params)}" if params else path
+
+def trip_logs_endpoint(cursor=None, **filters):
+    return paged_endpoint("trip_logs", cursor, **filters)
+
+def students_endpoint(cursor=None, **filters):
+    return paged_endpoint("students", cursor, **filters)
+
 def process_timer_data(data):
     """Vectorized calculation for time remaining"""
     if not data: 
@@ -44,7 +102,7 @@ def process_timer_data(data):
 def del_student_api(regno):
     """Helper to call the delete API"""
     try:
-        res = requests.delete(f"{API_BASE_URL}/delete-student/{regno}", timeout=3)
+        res = session.delete(f"{API_BASE_URL}/delete-student/{regno}", timeout=3)
         if res.status_code == 200:
             st.success(f"Student {regno} deleted.")
             st.session_state.confirm_delete_id = None
@@ -57,8 +115,7 @@ def del_student_api(regno):
 def fetch_block_limits():
     """Fetches block time limits from the DB"""
     try:
-        res = requests.get(f"{API_BASE_URL}/admin/get_limits", timeout=2)
-        return res.json() if res.status_code == 200 else []
+        return get_json("admin/get_limits")
 
     except Exception as e:
         st.error(f"Error fetching limits: {e}")
@@ -68,7 +125,7 @@ def update_block_limit(block, minutes):
     """Sends new limit to the API"""
     try:
         payload = {"block": block, "minutes": int(minutes)}
-        res = requests.post(f"{API_BASE_URL}/admin/update_limit", json=payload, timeout=3)
+        res = session.post(f"{API_BASE_URL}/admin/update_limit", json=payload, timeout=3)
         return res.status_code == 200
 
     except Exception as e:
@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+import requests
+from http_client import session
+
+ALERTS_KEPT = 200
+
+def read_events(response):
+    """Yields (event, data) from a text/event-stream response."""
+    kind, data = 'message', []
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line:
+            if data:
+                yield kind, json.loads('\n'.join(data))
+            kind, data = 'message', []
+            continue
+        if line.startswith(':'):
+            continue
+        field, _, value = line.partition(':')
+        value = value[1:] if value.startswith(' ') else value
+        if field == 'event':
+            kind = value
+        elif field == 'data':
+            data.append(value)
+
+class LiveFeed(threading.Thread):
+    """
+    Local copy of the active trips and late alerts, kept current from the
+    backend's /events stream. One instance serves every dashboard tab, so
+    the backend sees a single connection instead of a poll per tab.
+
+    On (re)connecting the stream sends a snapshot of the active trips and
+    the alerts are fetched once; after that only deltas arrive.
+    """
+
+    def __init__(self, base_url):
+        super().__init__(daemon=True)
+        self.base_url = base_url
+        self._lock = threading.Lock()
+        self._trips = {}   # trip id -> active trip
+        self._alerts = {}  # trip id -> late trip
+        self.connected = False
+
+    def active_trips(self):
+        with self._lock:
+            return list(self._trips.values())
+
+    def alerts(self):
+        with self._lock:
+            return sorted(self._alerts.values(), key=lambda t: t['expected_end_time'], reverse=True)
+
+    def run(self):
+        delay = 1
+        while True:
+            try:
+                # the backend sends a keepalive every 15 s, so a silent minute means it is gone
+                with session.get(f"{self.base_url}/events", stream=True, timeout=(3, 60)) as res:
+                    if res.status_code == 501:
+                        print("Backend offers no event stream, polling instead")
+                        return
+                    res.raise_for_status()
+                    res.encoding = 'utf-8'
+                    for kind, data in read_events(res):
+                        self._handle(kind, data)
+                        delay = 1
+            except (requests.RequestException, ValueError) as e:
+                print(f"Live feed disconnected: {e}")
+            self.connected = False
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    def _handle(self, kind, data):
+        if kind == 'snapshot':
+            res = session.get(f"{self.base_url}/alerts", params={'limit': ALERTS_KEPT}, timeout=5)
+            res.raise_for_status()
+            with self._lock:
+                self._trips = {trip['id']: trip for trip in data}
+                self._alerts = {trip['id']: trip for trip in res.json()}
+                self.connected = True
+            return
+
+        with self._lock:
+            if kind == 'started':
+                self._trips[data['id']] = data
+                return
+            self._trips.pop(data['id'], None)
+            if kind == 'late':
+                self._alerts[data['id']] = data
+                if len(self._alerts) > ALERTS_KEPT:
+                    oldest = min(self._alerts.values(), key=lambda t: t['expected_end_time'])
+                    del self._alerts[oldest['id']]
@@ -1,10 +1,10 @@
 import streamlit as st
 import pandas as pd
-from dashboard.api_client import fetch_api_data, REFRESH_RATE
+from dashboard.api_client import fetch_alerts, REFRESH_RATE
 
 @st.fragment(run_every=REFRESH_RATE)
 def render_alerts():
-    data = fetch_api_data("alerts")
+    data = fetch_alerts()
     if data:
         df = pd.DataFrame(data)
         
@@ -1,34 +1,69 @@
 import streamlit as st
 import pandas as pd
-from dashboard.api_client import fetch_api_data
+from datetime import timedelta
+from dashboard.api_client import fetch_api_data, fetch_block_limits, trip_logs_endpoint
 
-@st.fragment(run_every=30) 
+PAGE_SIZE = 50
+
+def reset_paging():
+    st.session_state.log_cursors = [None]
+
+@st.fragment(run_every=30)
 def render_trip_logs():
-    data = fetch_api_data("trip_logs")
-    
-    if not data:
+    # Cursors of the pages visited so far; the last one is the current page
+    if 'log_cursors' not in st.session_state:
+        reset_paging()
+
+    # Filters are applied by the backend, so they cover the full history
+    c1, c2, c3, c4 = st.columns([3, 1, 2, 1])
+    search = c1.text_input("🔍 Search Logs", placeholder="Student name or reg no...", on_change=reset_paging)
+    blocks = [""] + [item['block'] for item in fetch_block_limits()]
+    block = c2.selectbox("Block", blocks, on_change=reset_paging)
+    direction = c3.selectbox("Route", ["", "Hostel -> Library", "Library -> Hostel"], on_change=reset_paging)
+    status = c4.selectbox("Result", ["", "completed", "late"], on_change=reset_paging)
+    dates = st.date_input("Date Range", value=(), on_change=reset_paging)
+
+    since = until = None
+    if len(dates) == 2:
+        since, until = dates[0].isoformat(), (dates[1] + timedelta(days=1)).isoformat()
+
+    endpoint = trip_logs_endpoint(
+        st.session_state.log_cursors[-1],
+        q=search, block=block, direction=direction, status=status,
+        since=since, until=until, limit=PAGE_SIZE
+    )
+    data = fetch_api_data(endpoint) or {}
+    items = data.get('items', [])
+
+    if not items:
         st.info("No trip logs found.")
         return
 
-    df = pd.DataFrame(data)
-    
+    df = pd.DataFrame(items)
+
     # Convert and format Start Time
     df['Start'] = pd.to_datetime(df['start_time']).dt.strftime("%b %d, %I:%M %p")
-    
+
     # Convert and format End Time (handling potential nulls)
     df['End'] = pd.to_datetime(df['end_time']).dt.strftime("%b %d, %I:%M %p")
     df['End'] = df['End'].fillna("In Progress")
 
     # Rename columns for the UI
-    display_df = df[['student_name', 'direction', 'Start', 'End', 'status']].rename(columns={
+    display_df = df[['student_name', 'reg_no', 'direction', 'Start', 'End', 'status']].rename(columns={
         'student_name': 'Student',
+        'reg_no': 'Reg No',
         'direction': 'Route',
         'status': 'Result'
     })
 
-    # Add a search filter
-    search = st.text_input("🔍 Search Logs", placeholder="Type student name...")
-    if search:
-        display_df = display_df[display_df['Student'].str.contains(search, case=False)]
-
     st.dataframe(display_df, width='stretch', hide_index=True)
+
+    page = len(st.session_state.log_cursors)
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("← Newer", disabled=page == 1):
+        st.session_state.log_cursors.pop()
+        st.rerun(scope="fragment")
+    p2.caption(f"Page {page}")
+    if p3.button("Older →", disabled=not data.get('next_cursor')):
+        st.session_state.log_cursors.append(data['next_cursor'])
+        st.rerun(scope="fragment")
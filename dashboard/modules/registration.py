@@ -1,11 +1,28 @@
 import streamlit as st
-from dashboard.api_client import fetch_api_data, del_student_api
+from dashboard.api_client import fetch_api_data, fetch_block_limits, del_student_api, students_endpoint
+
+PAGE_SIZE = 50
+
+def reset_roster_paging():
+    st.session_state.roster_cursors = [None]
 
 @st.fragment(run_every=30) 
 def render_registration_table():
-    data = fetch_api_data("get_encodings")
-    if not data:
-        st.info("No students registered.")
+    # Cursors of the pages visited so far; the last one is the current page
+    if 'roster_cursors' not in st.session_state:
+        reset_roster_paging()
+
+    # Filtering and paging happen in the backend, which never sends face encodings here
+    c1, c2 = st.columns([3, 1])
+    search = c1.text_input("🔍 Search Students", placeholder="Name or reg no...", on_change=reset_roster_paging)
+    blocks = [""] + [item['block'] for item in fetch_block_limits()]
+    block = c2.selectbox("Block", blocks, key="roster_block", on_change=reset_roster_paging)
+
+    endpoint = students_endpoint(st.session_state.roster_cursors[-1], q=search, block=block, limit=PAGE_SIZE)
+    data = fetch_api_data(endpoint) or {}
+    items = data.get('items', [])
+    if not items:
+        st.info("No students match." if search or block else "No students registered.")
         return
 
     # Initialize state to track which student is being deleted
@@ -20,7 +37,7 @@ def render_registration_table():
     cols[3].write("**Action**")
     st.divider()
 
-    for sid, info in data.items():
+    for info in items:
         reg_no = info["reg_no"]
         cols = st.columns([3, 2, 2, 2])
         
@@ -43,3 +60,13 @@ def render_registration_table():
             if cols[3].button(":material/delete:", key=f"del_{reg_no}"):
                 st.session_state.confirm_delete_id = reg_no
                 st.rerun()
+
+    page = len(st.session_state.roster_cursors)
+    p1, p2, p3 = st.columns([1, 2, 1])
+    if p1.button("← Previous", key="roster_prev", disabled=page == 1):
+        st.session_state.roster_cursors.pop()
+        st.rerun(scope="fragment")
+    p2.caption(f"Page {page} · {data.get('total', 0)} students")
+    if p3.button("Next →", key="roster_next", disabled=not data.get('next_cursor')):
+        st.session_state.roster_cursors.append(data['next_cursor'])
+        st.rerun(scope="fragment")
@@ -1,9 +1,10 @@
 import streamlit as st
-from dashboard.api_client import fetch_api_data, process_timer_data, REFRESH_RATE
+from dashboard.api_client import fetch_active_trips, process_timer_data, REFRESH_RATE
 
 @st.fragment(run_every=REFRESH_RATE)
 def render_active_timers():
-    data = fetch_api_data("active_timers")
+    # refreshed locally for the countdowns; trip changes arrive via the live feed
+    data = fetch_active_trips()
     df = process_timer_data(data)
 
     if df.empty:
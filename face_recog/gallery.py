@@ -0,0 +1,218 @@
+import threading
+import time
+import numpy as np
+
+ENCODING_DIM = 128
+MATCH_TOLERANCE = 0.5
+
+class FaceGallery:
+    """
+    In-memory index of the known student encodings.
+
+    The encodings are packed once into a contiguous float32 matrix with
+    their squared norms precomputed, so a query is a single matrix product
+    instead of rebuilding an array from a Python list on every frame.
+
+    Rows live in buffers with spare capacity so apply_changes can patch the
+    gallery in place while recognition threads keep querying it.
+
+    sq_norms can be passed in (e.g. from the local cache) so a gallery
+    backed by a memory-mapped matrix starts without reading every row;
+    computed_on_load records whether anything had to be derived instead.
+    """
+
+    def __init__(self, ids, names, matrix, sq_norms=None):
+        self._lock = threading.RLock()
+        self.revision = 0
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        self.computed_on_load = sq_norms is None
+        if sq_norms is None:
+            sq_norms = np.einsum('ij,ij->i', matrix, matrix)
+        self._assign((
+            np.asarray(ids, dtype=np.int64),
+            np.asarray(names, dtype=object),
+            matrix,
+            np.asarray(sq_norms, dtype=np.float32),
+        ))
+        # the arrays may belong to the caller (or be a read-only mmap);
+        # they are copied before the first in-place change
+        self._owns_buffers = False
+
+    def _assign(self, buffers, size=None):
+        """
+        Installs per-row buffers (ids, names, matrix, sq_norms, ...extras).
+        Only the first `size` rows are live; the rest is spare capacity.
+        """
+        size = len(buffers[0]) if size is None else size
+        self._buffers = buffers
+        self.ids, self.names, self.matrix, self.sq_norms = (b[:size] for b in buffers[:4])
+        self._row_index = None
+
+    @property
+    def _rows(self):
+        """student id -> row, built on first use; only apply_changes needs it."""
+        if self._row_index is None:
+            self._row_index = {int(sid): row for row, sid in enumerate(self.ids)}
+        return self._row_index
+
+    def _write_row(self, row, student_id, name, encoding):
+        ids, names, matrix, sq_norms = self._buffers[:4]
+        ids[row], names[row], matrix[row] = student_id, name, encoding
+        sq_norms[row] = matrix[row] @ matrix[row]
+
+    @classmethod
+    def from_encodings(cls, ids, names, encodings):
+        """
+        Builds a gallery from parallel lists of ids, names and encodings.
+        """
+        if len(encodings) == 0:
+            matrix = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        else:
+            matrix = np.stack(encodings).astype(np.float32, copy=False)
+        return cls(ids, names, matrix)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def apply_changes(self, upserts, deletions, revision=None):
+        """
+        Patches the gallery in place. upserts is an iterable of
+        (student_id, name, encoding); deletions an iterable of student ids.
+        Deleted rows are filled by moving the last row into the hole.
+        """
+        upserts = list(upserts)
+        with self._lock:
+            n = len(self)
+            needed = n + sum(int(sid) not in self._rows for sid, _, _ in upserts)
+            capacity = len(self._buffers[0])
+            if needed > capacity or not self._owns_buffers:
+                if needed > capacity:
+                    capacity = max(2 * capacity, needed, 16)
+                grown = []
+                for buf in self._buffers:
+                    new = np.empty((capacity,) + buf.shape[1:], dtype=buf.dtype)
+                    new[:n] = buf[:n]
+                    grown.append(new)
+                self._buffers = tuple(grown)
+                self._owns_buffers = True
+            ids = self._buffers[0]
+
+            for sid in deletions:
+                row = self._rows.pop(int(sid), None)
+                if row is None:
+                    continue
+                last = n - 1
+                if row != last:
+                    for buf in self._buffers:
+                        buf[row] = buf[last]
+                    self._rows[int(ids[row])] = row
+                n -= 1
+
+            for sid, name, encoding in upserts:
+                row = self._rows.get(int(sid))
+                if row is None:
+                    row = self._rows[int(sid)] = n
+                    n += 1
+                self._write_row(row, sid, name, encoding)
+
+            self._assign(self._buffers, n)
+            if revision is not None:
+                self.revision = revision
+
+    def snapshot(self):
+        """Consistent copy of (ids, names, matrix, revision) for persisting."""
+        with self._lock:
+            return self.ids.copy(), self.names.copy(), self.matrix.copy(), self.revision
+
+    def cache_snapshot(self):
+        """snapshot() plus the derived arrays the cache stores, as a {name: array} dict."""
+        with self._lock:
+            return self.snapshot() + (self._derived_sections(),)
+
+    def _derived_sections(self):
+        return {'sq_norms': self.sq_norms.copy()}
+
+    def search(self, queries, k=1):
+        """
+        Exact top-k search for one or more query encodings.
+        Returns (distances, indices), both shaped (n_queries, k), sorted by distance.
+        """
+        with self._lock:
+            return self._exact_search(queries, k)
+
+    def _exact_search(self, queries, k):
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        n = len(self)
+        if n == 0:
+            empty = np.empty((len(queries), 0))
+            return empty, empty.astype(np.int64)
+
+        k = min(k, n)
+        q_norms = np.einsum('ij,ij->i', queries, queries)
+        # ||q - x||^2 = ||q||^2 + ||x||^2 - 2 q.x
+        sq_dist = self.sq_norms[None, :] - 2.0 * (queries @ self.matrix.T)
+        sq_dist += q_norms[:, None]
+        np.maximum(sq_dist, 0.0, out=sq_dist)
+
+        if k < n:
+            idx = np.argpartition(sq_dist, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(n), (len(queries), n))
+        part = np.take_along_axis(sq_dist, idx, axis=1)
+        order = np.argsort(part, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        dist = np.sqrt(np.take_along_axis(part, order, axis=1))
+        return dist, idx
+
+    def match(self, encoding, tolerance=MATCH_TOLERANCE):
+        """
+        Returns (student_id, name) of the closest known face within tolerance,
+        else (None, None).
+        """
+        with self._lock:
+            dist, idx = self.search(encoding, k=1)
+            if dist.shape[1] == 0 or dist[0, 0] > tolerance:
+                return None, None
+            best = idx[0, 0]
+            return int(self.ids[best]), self.names[best]
+
+    def match_batch(self, encodings, tolerance=MATCH_TOLERANCE):
+        """
+        Matches N encodings against the gallery in one N x M distance computation.
+        Returns a list of (student_id, name, distance), with id and name set to
+        None for faces that are not within tolerance.
+        """
+        if len(encodings) == 0:
+            return []
+        with self._lock:
+            if len(self) == 0:
+                return [(None, None, None)] * len(encodings)
+
+            dist, idx = self.search(np.stack(encodings), k=1)
+            matches = []
+            for d, i in zip(dist[:, 0], idx[:, 0]):
+                if d <= tolerance:
+                    matches.append((int(self.ids[i]), self.names[i], float(d)))
+                else:
+                    matches.append((None, None, float(d)))
+            return matches
+
+def benchmark(sizes=(1_000, 10_000, 100_000), queries=200):
+    """
+    Prints per-query latency of FaceGallery.match on random encodings.
+    """
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        encodings = rng.normal(scale=0.1, size=(size, ENCODING_DIM)).astype(np.float32)
+        gallery = FaceGallery(np.arange(size), [f"student {i}" for i in range(size)], encodings)
+        probes = encodings[rng.integers(0, size, queries)]
+
+        start = time.perf_counter()
+        for probe in probes:
+            gallery.match(probe)
+        per_query = (time.perf_counter() - start) / queries
+
+        print(f"{size:>7} identities: {per_query * 1000:.3f} ms/query")
+
+if __name__ == "__main__":
+    benchmark()
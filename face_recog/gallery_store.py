@@ -0,0 +1,130 @@
+import json
+import mmap
+import os
+import struct
+import time
+import numpy as np
+
+MAGIC = b'GAL1'
+
+def decode_gallery_sections(payload):
+    """
+    Decodes a gallery payload. Returns (ids, names, matrix, revision,
+    sections); the matrix and every extra section are read-only views
+    straight onto the payload bytes, no per-value parsing or copy.
+    """
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a gallery payload")
+    (header_len,) = struct.unpack_from('<I', payload, 4)
+    header = json.loads(payload[8:8 + header_len])
+    offset = 8 + header_len
+    offset += -offset % 16
+
+    count, dim = header['count'], header['dim']
+    matrix = np.frombuffer(payload, dtype='<f4', count=count * dim, offset=offset).reshape(count, dim)
+    sections = {}
+    for name, (dtype, shape, start) in header.get('sections', {}).items():
+        size = int(np.prod(shape))
+        sections[name] = np.frombuffer(payload, dtype=dtype, count=size, offset=offset + start).reshape(shape)
+    ids = sections.pop('ids', None)
+    return header['ids'] if ids is None else ids, header['names'], matrix, header['revision'], sections
+
+def decode_gallery_payload(payload):
+    """
+    Decodes a /get_encodings/binary payload.
+    Returns (ids, names, matrix, revision); matrix is a read-only float32
+    view straight onto the payload bytes, no per-value parsing or copy.
+    """
+    return decode_gallery_sections(payload)[:4]
+
+def encode_gallery_payload(ids, names, matrix, revision=0, sections=None):
+    """
+    Client-side mirror of the backend export, used for benchmarks and
+    caching. `sections` maps names to extra arrays (precomputed norms, a
+    trained index, ...) stored after the matrix, each 16-byte aligned.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype='<f4')
+    blobs = [matrix.tobytes()]
+    layout = {}
+    start = len(blobs[0])
+    for name, array in (sections or {}).items():
+        pad = -start % 16
+        blobs.append(b'\0' * pad)
+        start += pad
+        array = np.ascontiguousarray(array)
+        layout[name] = (array.dtype.str, list(array.shape), start)
+        blobs.append(array.tobytes())
+        start += array.nbytes
+
+    header = {'count': len(ids), 'dim': matrix.shape[1], 'revision': revision, 'names': list(names)}
+    if 'ids' not in layout:
+        header['ids'] = [int(i) for i in ids]
+    if layout:
+        header['sections'] = layout
+    header = json.dumps(header).encode('utf-8')
+    prefix = MAGIC + struct.pack('<I', len(header)) + header
+    prefix += b' ' * (-len(prefix) % 16)
+    return prefix + b''.join(blobs)
+
+def save_gallery_cache(path, gallery):
+    """
+    Writes the gallery to `path` in the export format, with the ids and
+    whatever the gallery derives from the encodings (norms, IVF training)
+    as extra sections, so loading it recomputes nothing. The file is
+    written beside the target and renamed over it, so a crash never
+    leaves a torn cache.
+    """
+    ids, names, matrix, revision, sections = gallery.cache_snapshot()
+    sections = dict(sections, ids=np.asarray(ids, dtype='<i8'))
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(encode_gallery_payload(ids, names, matrix, revision, sections))
+    os.replace(tmp, path)
+
+def load_gallery_cache(path):
+    """
+    Memory-maps a cache written by save_gallery_cache. Returns
+    (ids, names, matrix, revision, sections) with the arrays backed by the
+    mapping, so pages are only read as searches touch them; None if there
+    is no usable cache.
+    """
+    try:
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return decode_gallery_sections(mapped)
+    except (OSError, ValueError) as e:
+        if os.path.exists(path):
+            print(f"Ignoring unreadable gallery cache {path}: {e}")
+        return None
+
+def benchmark(n=50_000, dim=128):
+    """
+    Compares the JSON /get_encodings format with the binary export for n
+    students: payload size and client-side decode time.
+    """
+    rng = np.random.default_rng(0)
+    matrix = rng.normal(scale=0.1, size=(n, dim)).astype(np.float32)
+    ids = list(range(1, n + 1))
+    names = [f"Student {i}" for i in ids]
+
+    as_json = json.dumps({
+        i: {'name': name, 'block': 'A', 'reg_no': f"REG{i}", 'encoding': row.tolist()}
+        for i, name, row in zip(ids, names, matrix)
+    }).encode('utf-8')
+    as_binary = encode_gallery_payload(ids, names, matrix)
+
+    start = time.perf_counter()
+    data = json.loads(as_json)
+    np.stack([np.array(info['encoding'], dtype=np.float64) for info in data.values()])
+    json_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    decode_gallery_payload(as_binary)
+    binary_s = time.perf_counter() - start
+
+    print(f"{n} students")
+    print(f"  json:   {len(as_json) / 1e6:8.1f} MB  load {json_s * 1000:8.1f} ms")
+    print(f"  binary: {len(as_binary) / 1e6:8.1f} MB  load {binary_s * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    benchmark()
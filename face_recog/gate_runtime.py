@@ -0,0 +1,308 @@
+import threading
+import queue
+import sqlite3
+import time
+import cv2
+
+from face_recog.pipeline import FrameProcessor, FrameResult
+from face_recog.tracker import FaceTracker
+from face_recog.utils import draw_boxes
+
+class PipelineStats:
+    """
+    Thread-safe per-stage latency and counter registry for the gate pipeline.
+    Queue depths are sampled through gauges registered with watch().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latency = {}  # stage -> [count, total_seconds, max_seconds]
+        self._counters = {}
+        self._gauges = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            entry = self._latency.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def watch(self, name, fn):
+        self._gauges[name] = fn
+
+    def snapshot(self):
+        with self._lock:
+            latency = {
+                stage: {'count': c, 'avg_ms': total * 1000 / c if c else 0.0, 'max_ms': mx * 1000}
+                for stage, (c, total, mx) in self._latency.items()
+            }
+            counters = dict(self._counters)
+        depths = {name: fn() for name, fn in self._gauges.items()}
+        return {'latency': latency, 'counters': counters, 'queues': depths}
+
+    def report(self):
+        snap = self.snapshot()
+        parts = [f"{s}={v['avg_ms']:.1f}ms(max {v['max_ms']:.0f})" for s, v in snap['latency'].items()]
+        parts += [f"{k}={v}" for k, v in snap['counters'].items()]
+        parts += [f"{k}_depth={v}" for k, v in snap['queues'].items()]
+        return "[stats] " + " ".join(parts)
+
+class FrameGrabber(threading.Thread):
+    """
+    Reads the camera continuously and keeps only the newest frame, so slow
+    consumers always see the present instead of a backlog of stale frames.
+    """
+
+    def __init__(self, cap, stats, flip=True):
+        super().__init__(daemon=True)
+        self.cap = cap
+        self.stats = stats
+        self.flip = flip
+        self.stopped = threading.Event()
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self._taken = 0
+
+    def run(self):
+        while not self.stopped.is_set():
+            start = time.perf_counter()
+            ret, frame = self.cap.read()
+            if not ret:
+                self.stopped.set()
+                break
+            if self.flip:
+                frame = cv2.flip(frame, 1)
+            self.stats.record('capture', time.perf_counter() - start)
+
+            with self._cond:
+                if self._seq > self._taken:
+                    self.stats.incr('frames_dropped')
+                self._frame = frame
+                self._seq += 1
+                self._cond.notify_all()
+
+        with self._cond:
+            self._cond.notify_all()
+
+    def peek(self):
+        """Newest frame for display, without marking it as consumed."""
+        with self._cond:
+            return self._frame
+
+    def take(self, timeout=1.0):
+        """
+        Waits for a frame no worker has claimed yet and claims it, so each
+        frame goes to exactly one worker. Returns the frame, or None on
+        timeout or shutdown.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._seq > self._taken or self.stopped.is_set(), timeout)
+            if self._seq <= self._taken:
+                return None
+            self._taken = self._seq
+            return self._frame
+
+    def stop(self):
+        self.stopped.set()
+
+class RecognitionPool:
+    """
+    Worker threads that pull the newest frame, run detection + matching and
+    publish FrameResults. Each worker owns a FrameProcessor because its
+    frame buffers are not shareable, and its own FaceTracker when
+    reverify_every is set.
+    """
+
+    def __init__(self, gallery, grabber, stats, workers=1, max_results=4, reverify_every=0):
+        self.grabber = grabber
+        self.stats = stats
+        self.results = queue.Queue(maxsize=max_results)
+        self._stop = threading.Event()
+        self._threads = [
+            threading.Thread(target=self._work, args=(self._processor(gallery, reverify_every),), daemon=True)
+            for _ in range(workers)
+        ]
+        stats.watch('results', self.results.qsize)
+
+    @staticmethod
+    def _processor(gallery, reverify_every):
+        tracker = FaceTracker(reverify_every) if reverify_every else None
+        return FrameProcessor(gallery, tracker=tracker)
+
+    def start(self):
+        for t in self._threads:
+            t.start()
+        return self
+
+    def _work(self, processor):
+        while not self._stop.is_set():
+            frame = self.grabber.take()
+            if frame is None:
+                if self.grabber.stopped.is_set():
+                    break
+                continue
+
+            start = time.perf_counter()
+            result = processor.process(frame)
+            self.stats.record('recognition', time.perf_counter() - start)
+            self.stats.incr('faces_seen', len(result.faces))
+            self.stats.incr('faces_encoded', result.encoded)
+            self._publish(result)
+
+    def _publish(self, result):
+        while True:
+            try:
+                self.results.put_nowait(result)
+                return
+            except queue.Full:
+                # the display thread is behind; the oldest result is worthless now
+                try:
+                    self.results.get_nowait()
+                    self.stats.incr('results_dropped')
+                except queue.Empty:
+                    pass
+
+    def drain(self):
+        """Returns every result published since the last call, oldest first."""
+        out = []
+        while True:
+            try:
+                out.append(self.results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=2)
+
+class ScanDispatcher(threading.Thread):
+    """
+    Sends scans to the backend off the camera thread. Each scan is written
+    to the gate's journal as it is submitted, so one that never gets sent
+    (the queue is full behind a hung backend, or the gate is closed) is
+    still replayed later. send_scan is the gate's blocking request
+    function, called as send_scan(entry, scan_id, student_id, name,
+    captured_at) with the journal id and scan_id of the scan.
+    """
+
+    def __init__(self, send_scan, journal, location, stats, max_pending=100):
+        super().__init__(daemon=True)
+        self.send_scan = send_scan
+        self.journal = journal
+        self.location = location
+        self.stats = stats
+        self.pending = queue.Queue(maxsize=max_pending)
+        stats.watch('dispatch', self.pending.qsize)
+
+    def submit(self, student_id, name, captured_at=None):
+        captured_at = captured_at or time.time()
+        try:
+            entry, scan_id = self.journal.record(student_id, self.location, captured_at)
+        except sqlite3.Error as e:
+            self.stats.incr('journal_errors')
+            print(f"Could not journal scan for {name}: {e}")
+            return
+        try:
+            self.pending.put_nowait((entry, scan_id, student_id, name, captured_at))
+        except queue.Full:
+            self.stats.incr('scans_deferred')
+            print(f"Dispatch queue full, scan for {name} left in the journal for replay")
+
+    def run(self):
+        while True:
+            item = self.pending.get()
+            if item is None:
+                break
+            start = time.perf_counter()
+            try:
+                self.send_scan(*item)
+            except Exception as e:
+                # the scan is journaled, so the replayer picks it up
+                self.stats.incr('dispatch_errors')
+                print(f"Failed to send scan for {item[3]}: {e}")
+                continue
+            self.stats.record('dispatch', time.perf_counter() - start)
+            self.stats.incr('scans_sent')
+
+    def stop(self):
+        self.pending.put(None)
+        self.join(timeout=15)
+
+def run_gate(window, gallery, send_scan, journal, location, cooldown=5, workers=1, stats_interval=30,
+             show_verified=False, reverify_every=0):
+    """
+    Runs a gate: capture, recognition and scan dispatch each on their own
+    thread(s), with the OpenCV window driven from the calling thread.
+    Scans are journaled as `location` in `journal` before they are queued
+    for send_scan (see ScanDispatcher).
+    With reverify_every set, faces are tracked between frames and a scan is
+    sent once per tracked identity; the cooldown then only guards a student
+    who leaves the frame and comes straight back.
+    """
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        print("Error: Could not open webcam.")
+        return
+
+    stats = PipelineStats()
+    grabber = FrameGrabber(cap, stats)
+    recognizer = RecognitionPool(gallery, grabber, stats, workers=workers, reverify_every=reverify_every)
+    dispatcher = ScanDispatcher(send_scan, journal, location, stats)
+    grabber.start()
+    recognizer.start()
+    dispatcher.start()
+
+    last_recognition_time = {}
+    latest = FrameResult()
+    last_report = time.time()
+
+    print(f"{window} Active. Press 'q' to quit.")
+    cv2.namedWindow(window)
+
+    while not grabber.stopped.is_set():
+        now = time.time()
+        for result in recognizer.drain():
+            latest = result
+            # scan each newly identified face, subject to the per-student cooldown
+            for face in result.recognized():
+                if not face.new_identity:
+                    continue
+                last_seen = last_recognition_time.get(face.student_id, 0)
+                if now - last_seen > cooldown:
+                    dispatcher.submit(face.student_id, face.name, now)
+                    last_recognition_time[face.student_id] = now
+
+        frame = grabber.peek()
+        if frame is not None:
+            start = time.perf_counter()
+            frame = frame.copy()
+            draw_boxes(frame, latest.faces)
+            if show_verified:
+                for i, face in enumerate(latest.recognized()):
+                    cv2.putText(frame, f"Verified: {face.name}", (50, 50 + 40 * i), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+            cv2.imshow(window, frame)
+            stats.record('display', time.perf_counter() - start)
+
+        if stats_interval and now - last_report > stats_interval:
+            print(stats.report())
+            last_report = now
+
+        key = cv2.waitKey(1) & 0xFF
+        if cv2.getWindowProperty(window, cv2.WND_PROP_VISIBLE) < 1:
+            break
+        if key == ord('q'):
+            break
+
+    grabber.stop()
+    recognizer.stop()
+    dispatcher.stop()
+    print(stats.report())
+
+    cap.release()
+    cv2.destroyAllWindows()
@@ -1,17 +1,19 @@
-import cv2
 import time
-import requests
 import sys
 import os
+from functools import partial
 
-from face_recog.utils import fetch_known_encodings, recognize_face, draw_boxes
-from face_recognition import face_locations
+from face_recog.utils import load_gallery, post_scan, replay_journaled_scans, replay_student_backlog, scan_needs_retry
+from face_recog.gate_runtime import run_gate
+from face_recog.sync import GallerySync
+from face_recog.journal import ScanJournal, JournalReplayer
 
 # Configuration
 from config import Config
 API_BASE_URL = Config.API_BASE_URL
 HOSTEL_ENTRY_ENDPOINT = Config.HOSTEL_ENTRY_ENDPOINT
 ARDUINO_PORT = Config.ARDUINO_PORT
+RECOGNITION_COOLDOWN = 5
 
 # optional local serial control (only used if Arduino is attached
 # directly to the machine running this script).  The backend also
@@ -42,82 +44,73 @@ def trigger_local_arduino(cmd: str):
     except Exception as e:
         print(f"Local Arduino serial error: {e}")
 
-def hostel_gate_loop():
-    print("Initializing Hostel Gate System...")
-    
-    # Fetch known faces
-    print("Fetching known student encodings...")
-    known_ids, known_encodings, known_names = fetch_known_encodings()
-    print(f"Loaded {len(known_ids)} students.")
-
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
+def send_hostel_scan(entry, scan_id, student_id, name, captured_at, journal):
+    """
+    Reports a journaled hostel arrival to the backend and opens the local
+    gate if told to. Scans the backend never answered stay in the journal
+    and are replayed later.
+    """
+    print(f"Student {name} arrived at hostel...")
+    # earlier scans still queued for this student must reach the backend first
+    if not replay_student_backlog(journal, student_id, entry):
+        print(f"Earlier scans of {name} are still pending, scan queued behind them")
         return
+    try:
+        response = post_scan("Hostel", student_id, captured_at, scan_id)
+        if scan_needs_retry(response.status_code):
+            print(f"Entry Error: {response.status_code}, scan queued for replay")
+            return
+        journal.mark_sent([entry])
+
+        if response.status_code in (200, 201):
+            data = response.json()
+            print(f"Server: {data.get('message')}  open_gate={data.get('open_gate')}")
+            # if the backend tells us to open the gate and the board
+            # is connected locally, send the serial command here as
+            # well (this duplicates the backend behaviour but is
+            # handy when the board is hanging off the face laptop
+            # instead of the server).
+            if data.get('open_gate'):
+                # command depends on which gate this script controls
+                trigger_local_arduino("OPEN_HOSTEL")
+        else:
+            print(f"Entry Error: {response.status_code} {response.text}")
 
-    last_recognition_time = {}
-    RECOGNITION_COOLDOWN = 5
-
-    print("Hostel Gate Active. Press 'q' to quit.")
-    cv2.namedWindow("Hostel Gate")
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        frame = cv2.flip(frame, 1)
-
-        # performance optimization
-        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb_small = small_frame[:, :, ::-1]
-
-        # Detect faces
-        student_id, name = recognize_face(small_frame, known_ids, known_encodings, known_names)
-
-        boxes = face_locations(rgb_small)
-        draw_boxes(frame, boxes, name)
-        
-        if student_id:
-            cv2.putText(frame, f"Verified: {name}", (50, 50), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
-            
-            now = time.time()
-            last_seen = last_recognition_time.get(student_id, 0)
-            if now - last_seen > RECOGNITION_COOLDOWN:
-                print(f"Student {name} arrived at hostel...")
-                try:
-                    payload = {"student_id": student_id}
-                    response = requests.post(HOSTEL_ENTRY_ENDPOINT, json=payload, timeout=10)
-                    
-                    if response.status_code in (200, 201):
-                        data = response.json()
-                        print(f"Server: {data.get('message')}  open_gate={data.get('open_gate')}")
-                        # if the backend tells us to open the gate and the board
-                        # is connected locally, send the serial command here as
-                        # well (this duplicates the backend behaviour but is
-                        # handy when the board is hanging off the face laptop
-                        # instead of the server).
-                        if data.get('open_gate'):
-                            # command depends on which gate this script controls
-                            trigger_local_arduino("OPEN_HOSTEL")
-                    else:
-                        print(f"Entry Error: {response.status_code} {response.text}")
-
-                except Exception as e:
-                    print(f"Network error: {e}")
-                
-                last_recognition_time[student_id] = now
-
-        cv2.imshow('Hostel Gate', frame)
-
-        key = cv2.waitKey(1) & 0xFF
-        if cv2.getWindowProperty("Hostel Gate", cv2.WND_PROP_VISIBLE) < 1:
-            break
-        if key == ord('q'):
-            break
+    except Exception as e:
+        print(f"Network error: {e} (scan queued for replay)")
 
-    cap.release()
-    cv2.destroyAllWindows()
+def hostel_gate_loop():
+    print("Initializing Hostel Gate System...")
+    
+    # Load known faces (local cache first, backend otherwise)
+    print("Loading known student encodings...")
+    gallery = load_gallery()
+    print(f"Loaded {len(gallery)} students.")
+
+    # pick up registrations/deletions made while the gate is running
+    sync = GallerySync(gallery, interval=Config.GALLERY_SYNC_INTERVAL, cache_path=Config.GALLERY_CACHE_PATH)
+    sync.start()
+
+    # scans are journaled locally first and replayed if the backend was down
+    journal = ScanJournal(Config.SCAN_JOURNAL_PATH)
+    replayer = JournalReplayer(journal, replay_journaled_scans, interval=Config.SCAN_REPLAY_INTERVAL)
+    replayer.start()
+
+    run_gate(
+        "Hostel Gate",
+        gallery,
+        partial(send_hostel_scan, journal=journal),
+        journal,
+        "Hostel",
+        cooldown=RECOGNITION_COOLDOWN,
+        workers=Config.GATE_RECOGNITION_WORKERS,
+        stats_interval=Config.GATE_STATS_INTERVAL,
+        reverify_every=Config.GATE_REVERIFY_EVERY,
+        show_verified=True,
+    )
+    sync.stop()
+    replayer.stop()
+    journal.close()
 
 if __name__ == "__main__":
     hostel_gate_loop()
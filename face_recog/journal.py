@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+
+class ScanJournal:
+    """
+    Durable append-only log of scans made at this gate, kept in a local
+    SQLite file in WAL mode. Every scan is written before it is sent, and
+    stays pending until the backend has answered for it, so a network
+    outage delays movements instead of losing them. Each scan gets a
+    random scan_id that travels with every send, so the backend applies it
+    once however often it is retried.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scans ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " student_id INTEGER NOT NULL,"
+            " location TEXT NOT NULL,"
+            " captured_at REAL NOT NULL,"
+            " sent INTEGER NOT NULL DEFAULT 0,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " scan_id TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(scans)")}
+        if 'scan_id' not in columns:
+            # journals written before scan ids existed
+            self._conn.execute("ALTER TABLE scans ADD COLUMN scan_id TEXT")
+            self._conn.execute("UPDATE scans SET scan_id = lower(hex(randomblob(16))) WHERE scan_id IS NULL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_scans_pending ON scans (sent, id)")
+
+    def record(self, student_id, location, captured_at=None):
+        """Appends a scan and returns (journal id, scan_id)."""
+        captured_at = captured_at or time.time()
+        scan_id = uuid.uuid4().hex
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO scans (student_id, location, captured_at, scan_id) VALUES (?, ?, ?, ?)",
+                (student_id, location, captured_at, scan_id)
+            )
+            return cur.lastrowid, scan_id
+
+    def pending(self, limit=100, older_than=None):
+        """
+        Oldest unsent scans as (id, student_id, location, captured_at, scan_id),
+        optionally only those captured before the epoch time older_than.
+        """
+        cutoff = older_than if older_than is not None else float('inf')
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, student_id, location, captured_at, scan_id FROM scans "
+                "WHERE sent = 0 AND captured_at <= ? ORDER BY id LIMIT ?",
+                (cutoff, limit)
+            ).fetchall()
+
+    def pending_for_student(self, student_id, before):
+        """Unsent scans of one student journaled before entry `before`, in capture order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, student_id, location, captured_at, scan_id FROM scans "
+                "WHERE sent = 0 AND student_id = ? AND id < ? ORDER BY captured_at, id",
+                (student_id, before)
+            ).fetchall()
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM scans WHERE sent = 0").fetchone()[0]
+
+    def mark_sent(self, ids):
+        with self._lock:
+            self._conn.executemany("UPDATE scans SET sent = 1 WHERE id = ?", [(i,) for i in ids])
+
+    def mark_attempted(self, ids):
+        with self._lock:
+            self._conn.executemany("UPDATE scans SET attempts = attempts + 1 WHERE id = ?", [(i,) for i in ids])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+def scan_timestamp(captured_at):
+    """Wire format for capture times: naive local ISO-8601, like the backend's datetimes."""
+    return datetime.fromtimestamp(captured_at).isoformat()
+
+class JournalReplayer(threading.Thread):
+    """
+    Periodically re-sends pending journal entries, oldest first, in batches.
+    send_pending(rows) posts one batch and returns the journal ids the
+    backend has answered for; anything else stays pending for the next round.
+    Scans younger than min_age are left alone, since the live send for them
+    is probably still in flight; a scan sent twice is applied once anyway.
+    """
+
+    def __init__(self, journal, send_pending, interval=10, batch_size=50, min_age=30):
+        super().__init__(daemon=True)
+        self.journal = journal
+        self.send_pending = send_pending
+        self.interval = interval
+        self.batch_size = batch_size
+        self.min_age = min_age
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.replay()
+
+    def replay(self):
+        replayed = 0
+        while not self._stopped.is_set():
+            rows = self.journal.pending(self.batch_size, older_than=time.time() - self.min_age)
+            if not rows:
+                break
+            done = self.send_pending(rows)
+            self.journal.mark_attempted([row[0] for row in rows])
+            if not done:
+                break
+            self.journal.mark_sent(done)
+            replayed += len(done)
+            if len(done) < len(rows):
+                break
+        if replayed:
+            print(f"Replayed {replayed} queued scans ({self.journal.pending_count()} still pending).")
+        return replayed
+
+    def stop(self):
+        self._stopped.set()
@@ -1,16 +1,18 @@
-import cv2
 import time
-import requests
 import sys
 import os
+from functools import partial
 
-from face_recog.utils import fetch_known_encodings, recognize_face, draw_boxes
-from face_recognition import face_locations
+from face_recog.utils import load_gallery, post_scan, replay_journaled_scans, replay_student_backlog, scan_needs_retry
+from face_recog.gate_runtime import run_gate
+from face_recog.sync import GallerySync
+from face_recog.journal import ScanJournal, JournalReplayer
 
 from config import Config
 API_BASE_URL = Config.API_BASE_URL
 LIBRARY_EXIT_ENDPOINT = Config.LIBRARY_EXIT_ENDPOINT
 ARDUINO_PORT = Config.ARDUINO_PORT
+RECOGNITION_COOLDOWN = 5 # Seconds between API calls for the same person
 
 # local serial helper – generally the library gate script doesn't
 # need this, the backend opens the hostel gate, but it doesn't hurt to
@@ -36,76 +38,63 @@ def trigger_local_arduino(cmd: str):
     except Exception as e:
         print(f"Local Arduino serial error: {e}")
 
-def library_gate_loop():
-    print("Initializing library gate system...")
-    
-
-    # Fetch known faces
-    print("Fetching known student encodings...")
-    known_ids, known_encodings, known_names = fetch_known_encodings()
-    print(f"Loaded {len(known_ids)} students.")
-
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
+def send_library_scan(entry, scan_id, student_id, name, captured_at, journal):
+    print(f"Student {name} exiting library...")
+    # earlier scans still queued for this student must reach the backend first
+    if not replay_student_backlog(journal, student_id, entry):
+        print(f"Earlier scans of {name} are still pending, scan queued behind them")
         return
 
-    last_recognition_time = {}
-    RECOGNITION_COOLDOWN = 5 # Seconds between API calls for the same person
-
-    print("Library Gate Active. Press 'q' to quit.")
-    cv2.namedWindow("Library Gate")
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-        
-        frame = cv2.flip(frame, 1)
-
-        # performance optimization
-        small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-        rgb_small = small_frame[:, :, ::-1]
-
-        # Detect faces
-        student_id, name = recognize_face(small_frame, known_ids, known_encodings, known_names)
-
-        boxes = face_locations(rgb_small)
-        draw_boxes(frame, boxes, name)
-
-        if student_id:
-            now = time.time()
-            last_seen = last_recognition_time.get(student_id, 0)
-            if now - last_seen > RECOGNITION_COOLDOWN:
-                print(f"Student {name} exiting library...")
-
-                try:
-                    payload = {"student_id": student_id} 
-                    res = requests.post(LIBRARY_EXIT_ENDPOINT, json=payload, timeout=10)
-
-                    if res.status_code in (200, 201):
-                        data = res.json()
-                        print(f"Server: {data.get('message')}  open_gate={data.get('open_gate')}")
-                        if data.get('open_gate'):
-                            trigger_local_arduino("OPEN_LIBRARY")
-                    else:
-                        print(f"Server error: {res.status_code} {res.text}")
-
-                except Exception as e:
-                    print(f"Network error: {e}")
-                
-                last_recognition_time[student_id] = now
+    try:
+        res = post_scan("Library", student_id, captured_at, scan_id)
+        if scan_needs_retry(res.status_code):
+            print(f"Server error: {res.status_code}, scan queued for replay")
+            return
+        journal.mark_sent([entry])
+
+        if res.status_code in (200, 201):
+            data = res.json()
+            print(f"Server: {data.get('message')}  open_gate={data.get('open_gate')}")
+            if data.get('open_gate'):
+                trigger_local_arduino("OPEN_LIBRARY")
+        else:
+            print(f"Server error: {res.status_code} {res.text}")
 
-        cv2.imshow('Library Gate', frame)
+    except Exception as e:
+        print(f"Network error: {e} (scan queued for replay)")
 
-        key = cv2.waitKey(1) & 0xFF
-        if cv2.getWindowProperty("Library Gate", cv2.WND_PROP_VISIBLE) < 1:
-            break
-        if key == ord('q'):
-            break
+def library_gate_loop():
+    print("Initializing library gate system...")
+    
 
-    cap.release()
-    cv2.destroyAllWindows()
+    # Load known faces (local cache first, backend otherwise)
+    print("Loading known student encodings...")
+    gallery = load_gallery()
+    print(f"Loaded {len(gallery)} students.")
+
+    # pick up registrations/deletions made while the gate is running
+    sync = GallerySync(gallery, interval=Config.GALLERY_SYNC_INTERVAL, cache_path=Config.GALLERY_CACHE_PATH)
+    sync.start()
+
+    # scans are journaled locally first and replayed if the backend was down
+    journal = ScanJournal(Config.SCAN_JOURNAL_PATH)
+    replayer = JournalReplayer(journal, replay_journaled_scans, interval=Config.SCAN_REPLAY_INTERVAL)
+    replayer.start()
+
+    run_gate(
+        "Library Gate",
+        gallery,
+        partial(send_library_scan, journal=journal),
+        journal,
+        "Library",
+        cooldown=RECOGNITION_COOLDOWN,
+        workers=Config.GATE_RECOGNITION_WORKERS,
+        stats_interval=Config.GATE_STATS_INTERVAL,
+        reverify_every=Config.GATE_REVERIFY_EVERY,
+    )
+    sync.stop()
+    replayer.stop()
+    journal.close()
 
 if __name__ == "__main__":
     library_gate_loop()
@@ -0,0 +1,93 @@
+from dataclasses import dataclass, field
+import face_recognition
+import cv2
+
+from face_recog.gallery import MATCH_TOLERANCE
+
+@dataclass
+class FaceMatch:
+    box: tuple  # (top, right, bottom, left) in full-frame pixels
+    student_id: int = None
+    name: str = None
+    distance: float = None
+    track_id: int = None
+    # True on the frame where this face's identity was first established,
+    # i.e. when the gate should send a scan for it
+    new_identity: bool = True
+
+@dataclass
+class FrameResult:
+    faces: list = field(default_factory=list)
+    encoded: int = 0  # faces that went through the encoder this frame
+
+    def recognized(self):
+        return [f for f in self.faces if f.student_id is not None]
+
+class FrameProcessor:
+    """
+    Runs detection once per frame and encodes only the detected boxes.
+
+    The downscaled frame and its RGB copy are written into buffers that are
+    reused across frames, so a steady camera stream allocates nothing here.
+    With a FaceTracker, faces that are already identified skip the encoder
+    until they are due for re-verification.
+    """
+
+    def __init__(self, gallery, scale=0.5, tolerance=MATCH_TOLERANCE, tracker=None):
+        self.gallery = gallery
+        self.scale = scale
+        self.tolerance = tolerance
+        self.tracker = tracker
+        self._small = None
+        self._rgb = None
+
+    def _prepare(self, frame):
+        h, w = frame.shape[:2]
+        size = (int(w * self.scale), int(h * self.scale))
+        if self._small is None or self._small.shape[1::-1] != size:
+            self._small = cv2.resize(frame, size)
+            self._rgb = cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB)
+        else:
+            cv2.resize(frame, size, dst=self._small)
+            cv2.cvtColor(self._small, cv2.COLOR_BGR2RGB, dst=self._rgb)
+        return self._rgb
+
+    def _to_full_size(self, box):
+        return tuple(int(v / self.scale) for v in box)
+
+    def process(self, frame):
+        rgb = self._prepare(frame)
+        boxes = face_recognition.face_locations(rgb, model="hog")
+        if self.tracker is not None:
+            return self._process_tracked(rgb, boxes)
+        if not boxes:
+            return FrameResult()
+        if len(self.gallery) == 0:
+            return FrameResult([FaceMatch(self._to_full_size(box)) for box in boxes])
+
+        encodings = face_recognition.face_encodings(rgb, boxes)
+        matches = self.gallery.match_batch(encodings, self.tolerance)
+        faces = [
+            FaceMatch(self._to_full_size(box), student_id, name, distance)
+            for box, (student_id, name, distance) in zip(boxes, matches)
+        ]
+        return FrameResult(faces, len(encodings))
+
+    def _process_tracked(self, rgb, boxes):
+        tracks = self.tracker.update(boxes)
+        stale = [i for i, track in enumerate(tracks) if self.tracker.needs_encoding(track)]
+
+        changed = set()
+        encoded = 0
+        if stale and len(self.gallery) > 0:
+            encodings = face_recognition.face_encodings(rgb, [boxes[i] for i in stale])
+            encoded = len(encodings)
+            for i, match in zip(stale, self.gallery.match_batch(encodings, self.tolerance)):
+                if tracks[i].set_identity(*match):
+                    changed.add(i)
+
+        faces = [
+            FaceMatch(self._to_full_size(box), t.student_id, t.name, t.distance, t.id, i in changed)
+            for i, (box, t) in enumerate(zip(boxes, tracks))
+        ]
+        return FrameResult(faces, encoded)
@@ -0,0 +1,52 @@
+"""
+Request round-trip latency against a running backend, opening a new
+connection per request (bare requests calls, as the gates and dashboard
+used to) versus the shared keep-alive session from http_client:
+
+    python -m face_recog.scan_latency [--requests N] [--student-id ID]
+
+Scans go to a student id that does not exist by default, so the backend
+answers 404 after looking the student up and no trips are recorded.
+"""
+import argparse
+import statistics
+import time
+import requests
+
+from http_client import session
+from config import Config
+
+def measure(send, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        send()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[len(timings) // 2], timings[int(len(timings) * 0.95)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--student-id', type=int, default=999999999)
+    args = parser.parse_args()
+
+    scan_url = Config.LIBRARY_EXIT_ENDPOINT
+    poll_url = f"{Config.API_BASE_URL}/active_timers"
+    payload = {"student_id": args.student_id}
+    # one request each first, so neither side pays for the backend's first hit
+    session.post(scan_url, json=payload)
+
+    cases = [
+        ("scan, new connection", lambda: requests.post(scan_url, json=payload, timeout=10)),
+        ("scan, shared session", lambda: session.post(scan_url, json=payload)),
+        ("poll, new connection", lambda: requests.get(poll_url, timeout=10)),
+        ("poll, shared session", lambda: session.get(poll_url)),
+    ]
+    print(f"{args.requests} requests each against {Config.API_BASE_URL}")
+    for label, send in cases:
+        mean, p50, p95 = measure(send, args.requests)
+        print(f"{label:22s} mean={mean:6.2f}ms  p50={p50:6.2f}ms  p95={p95:6.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import threading
+import numpy as np
+
+from face_recog.utils import fetch_encoding_changes, fetch_gallery_binary
+from face_recog.gallery_store import save_gallery_cache
+
+class GallerySync(threading.Thread):
+    """
+    Background refresher that keeps a gate's gallery in step with the
+    backend by pulling only the changes since the gallery's revision.
+    When cache_path is set, the local cache is rewritten after each change.
+    """
+
+    def __init__(self, gallery, interval=5, cache_path=None):
+        super().__init__(daemon=True)
+        self.gallery = gallery
+        self.interval = interval
+        self.cache_path = cache_path
+        self._stopped = threading.Event()
+
+    def run(self):
+        # reconcile straight away: the gallery may come from a stale cache
+        self.sync_once()
+        while not self._stopped.wait(self.interval):
+            self.sync_once()
+
+    def sync_once(self):
+        if self.gallery.revision is None:
+            return self._reload()
+
+        changes = fetch_encoding_changes(self.gallery.revision)
+        if changes is None:
+            return False
+
+        if changes.get("reset"):
+            return self._reload()
+
+        upserts = [
+            (int(sid), info["name"], np.asarray(info["encoding"], dtype=np.float32))
+            for sid, info in changes["upserts"].items()
+        ]
+        deleted = changes["deleted"]
+        if upserts or deleted:
+            self.gallery.apply_changes(upserts, deleted, revision=changes["revision"])
+            print(f"Gallery synced to revision {changes['revision']}: "
+                  f"{len(upserts)} updated, {len(deleted)} removed ({len(self.gallery)} students).")
+            self._save()
+        else:
+            self.gallery.revision = changes["revision"]
+        return True
+
+    def _reload(self):
+        """
+        Replaces the whole gallery content, for a gate that started without
+        data or whose revision the backend no longer knows.
+        """
+        ids, names, matrix, revision = fetch_gallery_binary()
+        if revision is None:
+            return False
+        stale = set(int(i) for i in self.gallery.ids) - set(ids)
+        self.gallery.apply_changes(zip(ids, names, matrix), stale, revision=revision)
+        print(f"Gallery reloaded at revision {revision} ({len(self.gallery)} students).")
+        self._save()
+        return True
+
+    def _save(self):
+        if not self.cache_path:
+            return
+        try:
+            save_gallery_cache(self.cache_path, self.gallery)
+        except OSError as e:
+            print(f"Could not update gallery cache: {e}")
+
+    def stop(self):
+        self._stopped.set()
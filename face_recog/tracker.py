@@ -0,0 +1,92 @@
+import itertools
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = box
+        self.student_id = None
+        self.name = None
+        self.distance = None
+        self.misses = 0
+        self.since_verify = 0
+        self.verified = False  # has been through the encoder at least once
+
+    def set_identity(self, student_id, name, distance):
+        """Returns True if this changes who the track is (so a scan is due)."""
+        changed = student_id is not None and student_id != self.student_id
+        self.student_id, self.name, self.distance = student_id, name, distance
+        self.since_verify = 0
+        self.verified = True
+        return changed
+
+def iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes."""
+    t, r = max(a[0], b[0]), min(a[1], b[1])
+    btm, l = min(a[2], b[2]), max(a[3], b[3])
+    inter = max(0, r - l) * max(0, btm - t)
+    if inter == 0:
+        return 0.0
+    area_a = (a[1] - a[3]) * (a[2] - a[0])
+    area_b = (b[1] - b[3]) * (b[2] - b[0])
+    return inter / float(area_a + area_b - inter)
+
+class FaceTracker:
+    """
+    Associates detections across frames by box overlap so a face that has
+    already been identified is only re-encoded every `reverify_every` frames.
+    """
+
+    def __init__(self, reverify_every=15, iou_threshold=0.3, max_misses=5):
+        self.reverify_every = reverify_every
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def update(self, boxes):
+        """
+        Matches this frame's boxes to existing tracks (greedy, highest IoU
+        first), opens tracks for new faces and retires ones that have been
+        missing for too long. Returns one Track per input box.
+        """
+        pairs = sorted(
+            ((iou(box, track.box), bi, ti)
+             for bi, box in enumerate(boxes)
+             for ti, track in enumerate(self.tracks)),
+            reverse=True,
+        )
+
+        assigned = [None] * len(boxes)
+        used = set()
+        for overlap, bi, ti in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if assigned[bi] is not None or ti in used:
+                continue
+            assigned[bi] = self.tracks[ti]
+            used.add(ti)
+
+        for ti, track in enumerate(self.tracks):
+            if ti not in used:
+                track.misses += 1
+
+        for bi, box in enumerate(boxes):
+            track = assigned[bi]
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+                assigned[bi] = track
+            else:
+                track.box = box
+                track.misses = 0
+                track.since_verify += 1
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        return assigned
+
+    def needs_encoding(self, track):
+        return (
+            not track.verified
+            or track.student_id is None
+            or track.since_verify >= self.reverify_every
+        )
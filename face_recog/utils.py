@@ -1,12 +1,24 @@
 from requests.exceptions import RequestException 
-import requests
 import face_recognition
 import numpy as np
 import cv2
 
+from face_recog.gallery import FaceGallery, ENCODING_DIM
+from face_recog.ann import IVFGallery
+from face_recog.gallery_store import decode_gallery_payload, load_gallery_cache, save_gallery_cache
+from face_recog.journal import scan_timestamp
+from http_client import session
+
 # Configuration
 from config import Config
 API_BASE_URL = Config.API_BASE_URL
+MATCHER_BACKEND = Config.MATCHER_BACKEND
+IVF_NPROBE = Config.IVF_NPROBE
+GALLERY_CACHE_PATH = Config.GALLERY_CACHE_PATH
+SCAN_ENDPOINTS = {
+    "Library": Config.LIBRARY_EXIT_ENDPOINT,
+    "Hostel": Config.HOSTEL_ENTRY_ENDPOINT,
+}
 
 def get_face_encoding(frame):
     """
@@ -30,7 +42,7 @@ def check_reg_exists(regno):
     Checks if regno is already in the database
     """
     try:
-        res = requests.get(f"{API_BASE_URL}/check-student/{regno}")
+        res = session.get(f"{API_BASE_URL}/check-student/{regno}")
         return res.status_code == 200  # Returns True if exists
     except Exception as e:
         print(f"Connection error: {e}")
@@ -49,7 +61,7 @@ def register_student_api(name, encoding, block,regno):
     }
 
     try:
-        res = requests.post(url, json=payload, timeout=10)
+        res = session.post(url, json=payload, timeout=10)
         try:
             data = res.json()
         except ValueError:
@@ -59,67 +71,130 @@ def register_student_api(name, encoding, block,regno):
     except RequestException as e:
         return None, 500
 
-def fetch_known_encodings():
+def fetch_gallery_binary():
     """
-    Fetches all stored faces from backend.
-    Returns known_ids, known_names, known_encodings.
+    Fetches all stored faces through the binary bulk export.
+    Returns (ids, names, matrix, revision); empty with revision None on failure.
     """
-    url = f"{API_BASE_URL}/get_encodings"
+    url = f"{API_BASE_URL}/get_encodings/binary"
+    empty = ([], [], np.empty((0, ENCODING_DIM), dtype=np.float32), None)
 
     try:
-        res = requests.get(url, timeout=10)
-
+        res = session.get(url, timeout=30)
         if res.status_code != 200:
             print(f"Failed to fetch encodings: {res.status_code}")
-            return [], [], []
-        
-        data = res.json()
-        known_ids, known_names, known_encodings = [], [], []
+            return empty
+        return decode_gallery_payload(res.content)
 
-        for student_id, info in data.items():
-            known_ids.append(int(student_id))
-            known_encodings.append(np.array(info["encoding"], dtype=np.float64))
-            known_names.append(info["name"])
+    except (RequestException, ValueError) as e:
+        print(f"Error loading encodings from backend: {e}")
+        return empty
+
+def fetch_encoding_changes(since):
+    """
+    Fetches registrations/deletions after revision `since`.
+    Returns the decoded change set, or None if the backend is unreachable.
+    """
+    url = f"{API_BASE_URL}/get_encodings/changes"
+
+    try:
+        res = session.get(url, params={"since": since}, timeout=10)
+        if res.status_code != 200:
+            print(f"Failed to fetch encoding changes: {res.status_code}")
+            return None
+        return res.json()
 
-        return known_ids, known_names, known_encodings
-        
     except RequestException as e:
         print(f"Error connecting to backend: {e}")
-        return [], [], []
+        return None
 
-def recognize_face(image, student_ids, names, encodings):
+def post_scan(location, student_id, captured_at, scan_id=None, timeout=10):
     """
-    Matches the face in the image against known encodings.
-    Returns (student_id, name) if match found, else (None, None).
+    Reports a scan with its original capture time. The backend applies a
+    given scan_id only once, so resending after a timeout is safe.
+    Raises RequestException when the backend cannot be reached.
     """
-    if not encodings:
-        return None, None
-
-    known_encodings = np.array(encodings)
-
-    unknown_encoding = get_face_encoding(image)
-    if unknown_encoding is None:
-        return None, None
+    payload = {"student_id": student_id, "scanned_at": scan_timestamp(captured_at), "scan_id": scan_id}
+    return session.post(SCAN_ENDPOINTS[location], json=payload, timeout=timeout)
 
-    face_distances = face_recognition.face_distance(known_encodings, unknown_encoding)
-    best = np.argmin(face_distances)
+def scan_needs_retry(status_code):
+    """Server errors, and 409 for scans that lost a race with another scan of the same student."""
+    return status_code >= 500 or status_code == 409
 
-    # tolerance
-    if face_distances[best] <= 0.5:
-        return student_ids[best], names[best]
+def replay_journaled_scans(rows):
+    """
+    Re-sends journal rows (id, student_id, location, captured_at, scan_id)
+    through /scan_batch in one request. Returns the ids the backend answered
+    for.
+    """
+    events = [
+        {"student_id": student_id, "location": location, "scanned_at": scan_timestamp(captured_at), "scan_id": scan_id}
+        for _, student_id, location, captured_at, scan_id in rows
+    ]
+    try:
+        res = session.post(f"{API_BASE_URL}/scan_batch", json={"events": events}, timeout=30)
+        if res.status_code != 200:
+            return []
+        results = res.json()["results"]
+    except (RequestException, ValueError, KeyError):
+        return []
 
-    return None, None
+    return [row[0] for row, result in zip(rows, results) if result and not scan_needs_retry(result.get("code", 500))]
 
-def draw_boxes(frame, boxes, name):
-    if not name:
-        name = "Unknown"
+def replay_student_backlog(journal, student_id, entry):
+    """
+    Sends the student's older pending journal entries, in capture order,
+    before their live scan (journal id `entry`) goes out, so the backend
+    never applies the live scan ahead of them. Returns False if some are
+    still pending; the live scan must then wait behind them in the journal.
+    """
+    rows = journal.pending_for_student(student_id, before=entry)
+    if not rows:
+        return True
+    done = replay_journaled_scans(rows)
+    journal.mark_attempted([row[0] for row in rows])
+    journal.mark_sent(done)
+    return len(done) == len(rows)
+
+def load_gallery(cache_path=GALLERY_CACHE_PATH):
+    """
+    Packs the known faces into the configured matcher: exact FaceGallery,
+    or IVFGallery when MATCHER_BACKEND is "ivf".
+    Starts from the memory-mapped local cache when there is one (GallerySync
+    then catches up with the backend in the background), otherwise fetches
+    from the backend and writes the cache. The cache also holds the norms
+    and IVF training, so starting from it reads no rows; it is rewritten
+    whenever those had to be computed. A revision of None means nothing
+    could be loaded yet.
+    """
+    loaded = load_gallery_cache(cache_path) if cache_path else None
+    from_cache = loaded is not None
+    if not from_cache:
+        loaded = fetch_gallery_binary() + ({},)
+
+    ids, names, matrix, revision, sections = loaded
+    if MATCHER_BACKEND == "ivf":
+        gallery = IVFGallery(ids, names, matrix, nprobe=IVF_NPROBE, **sections)
+    else:
+        gallery = FaceGallery(ids, names, matrix, sq_norms=sections.get('sq_norms'))
+    gallery.revision = revision
+
+    if from_cache:
+        print(f"Using local gallery cache at revision {revision}.")
+    if cache_path and revision is not None and (gallery.computed_on_load or not from_cache):
+        try:
+            save_gallery_cache(cache_path, gallery)
+        except OSError as e:
+            print(f"Could not update gallery cache: {e}")
+    return gallery
 
-    for (t, r, b, l) in boxes:
-        # scale back to full size
-        t *= 2
-        r *= 2
-        b *= 2
-        l *= 2
+def draw_boxes(frame, faces):
+    """
+    Draws a labelled box for each FaceMatch (boxes are in full-frame pixels).
+    """
+    for face in faces:
+        t, r, b, l = face.box
+        label = face.name or "Unknown"
 
         # increase box padding
         pad = int((b-t) * 0.10)
@@ -129,8 +204,6 @@ def draw_boxes(frame, boxes, name):
         # draw rectangle
         cv2.rectangle(frame, (l, t), (r, b), (0, 255, 0), 2)
 
-        label = name
-
         # get text size to fit label background
         (text_w, text_h), baseline = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1)
 
@@ -0,0 +1,45 @@
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config import Config
+
+# answers worth retrying a safe request for: the backend restarting
+# or a proxy in front of it timing out
+RETRY_STATUSES = (502, 503, 504)
+RETRY_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+class ApiSession(requests.Session):
+    """
+    Keep-alive session shared by everything in one gate or dashboard
+    process, so scans, polls and syncs reuse pooled connections instead of
+    opening a new one per request.
+
+    Every request gets the default timeout unless it passes its own.
+    Connections that fail to open are retried for any method (nothing was
+    sent yet); other errors and RETRY_STATUSES only for RETRY_METHODS, so a
+    scan POST or a student DELETE is never sent twice by this layer (the
+    gates journal and replay scans themselves). With compression off, gzip is not offered.
+    """
+
+    def __init__(self, timeout=Config.HTTP_TIMEOUT, retries=Config.HTTP_RETRIES,
+                 pool_size=Config.HTTP_POOL_SIZE, compression=Config.HTTP_COMPRESSION):
+        super().__init__()
+        self.timeout = timeout
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.2,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=RETRY_METHODS,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.mount('http://', adapter)
+        self.mount('https://', adapter)
+        self.headers['Accept-Encoding'] = 'gzip, deflate' if compression else 'identity'
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return super().request(method, url, **kwargs)
+
+session = ApiSession()